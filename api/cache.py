@@ -0,0 +1,189 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def is_process_local(cache):
+    """
+    Whether entries of the cache are only seen by the process that wrote them.
+    """
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process cache that evicts the least recently used entry.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionedCache:
+    """
+    Two-tier cache (in-process LRU in front of a shared Django cache) whose
+    entries are keyed by a per-namespace version counter. Bumping the version
+    of a namespace orphans all of its entries at once.
+    """
+
+    def __init__(self, prefix, alias=None, local_maxsize=None, timeout=None):
+        options = settings.RESPONSE_CACHE
+        self.prefix = prefix
+        self.alias = alias or options['CACHE_ALIAS']
+        self.timeout = timeout or options['TIMEOUT']
+        self.local = LRUCache(local_maxsize or options['LOCAL_MAXSIZE'])
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _version_key(self, namespace):
+        return f'{self.prefix}:{namespace}:version'
+
+    def _entry_key(self, namespace, version, key):
+        return f'{self.prefix}:{namespace}:{version}:{key}'
+
+    def get_version(self, namespace):
+        """
+        Return the (version, modified timestamp) pair of a namespace.
+        """
+        version_key = self._version_key(namespace)
+        modified_key = version_key + ':modified'
+        values = self.shared.get_many([version_key, modified_key])
+        if version_key not in values:
+            # Seed from the clock so a lost counter never comes back to an old value.
+            now = time.time()
+            self.shared.add(version_key, time.time_ns() // 1000, timeout=None)
+            self.shared.add(modified_key, now, timeout=None)
+            values = self.shared.get_many([version_key, modified_key])
+        return values[version_key], values.get(modified_key, time.time())
+
+    async def aget_version(self, namespace):
+        version_key = self._version_key(namespace)
+        modified_key = version_key + ':modified'
+        values = await self.shared.aget_many([version_key, modified_key])
+        if version_key not in values:
+            now = time.time()
+            await self.shared.aadd(version_key, time.time_ns() // 1000, timeout=None)
+            await self.shared.aadd(modified_key, now, timeout=None)
+            values = await self.shared.aget_many([version_key, modified_key])
+        return values[version_key], values.get(modified_key, time.time())
+
+    def bump(self, namespace):
+        version_key = self._version_key(namespace)
+        try:
+            self.shared.incr(version_key)
+        except ValueError:
+            self.shared.add(version_key, time.time_ns() // 1000, timeout=None)
+        self.shared.set(version_key + ':modified', time.time(), timeout=None)
+
+    def get(self, namespace, version, key):
+        entry_key = self._entry_key(namespace, version, key)
+        value = self.local.get(entry_key)
+        if value is None:
+            value = self.shared.get(entry_key)
+            if value is not None:
+                self.local.set(entry_key, value)
+        return value
+
+    async def aget(self, namespace, version, key):
+        entry_key = self._entry_key(namespace, version, key)
+        value = self.local.get(entry_key)
+        if value is None:
+            value = await self.shared.aget(entry_key)
+            if value is not None:
+                self.local.set(entry_key, value)
+        return value
+
+    def set(self, namespace, version, key, value):
+        entry_key = self._entry_key(namespace, version, key)
+        self.local.set(entry_key, value)
+        self.shared.set(entry_key, value, timeout=self.timeout)
+
+    async def aset(self, namespace, version, key, value):
+        entry_key = self._entry_key(namespace, version, key)
+        self.local.set(entry_key, value)
+        await self.shared.aset(entry_key, value, timeout=self.timeout)
+
+    def clear_local(self):
+        self.local.clear()
+
+
+def _get_validators(namespace, version, key, modified):
+    etag = quote_etag(f'{namespace}-{version}-{hashlib.md5(key.encode()).hexdigest()[:8]}')
+    # Rounded up, HTTP dates have whole seconds and must not predate the change.
+    return etag, math.ceil(modified)
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_response(request, cache, namespace, key, build_data):
+    """
+    Serve build_data() through a VersionedCache namespace, with ETag and
+    Last-Modified validators and 304 answers to conditional requests.
+    """
+    version, modified = cache.get_version(namespace)
+    etag, last_modified = _get_validators(namespace, version, key, modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = cache.get(namespace, version, key)
+        if data is None:
+            data = build_data()
+            cache.set(namespace, version, key, data)
+        response = Response(data)
+    return _set_validators(response, etag, last_modified)
+
+
+async def acached_response(request, cache, namespace, key, abuild_data):
+    """
+    Async counterpart of cached_response(), abuild_data is a coroutine function.
+    """
+    version, modified = await cache.aget_version(namespace)
+    etag, last_modified = _get_validators(namespace, version, key, modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = await cache.aget(namespace, version, key)
+        if data is None:
+            data = await abuild_data()
+            await cache.aset(namespace, version, key, data)
+        response = Response(data)
+    return _set_validators(response, etag, last_modified)
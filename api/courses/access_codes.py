@@ -0,0 +1,92 @@
+import functools
+import secrets
+import string
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from api.courses.entitlements import invalidate_entitlements
+from api.courses.models import AccessCode, BoughtCourse
+from api.users.cache import bump_profile_version
+from api.users.models import Profile
+
+ALPHABET = string.ascii_uppercase + string.digits
+
+
+class AccessCodeError(Exception):
+    pass
+
+
+def generate_code(length=None):
+    """
+    A random code from the system CSPRNG, e.g. 'K7Q2-9XMB-4RTD'.
+    """
+    length = length or settings.ACCESS_CODES['LENGTH']
+    code = ''.join(secrets.choice(ALPHABET) for _ in range(length))
+    return '-'.join(code[i:i + 4] for i in range(0, length, 4))
+
+
+def normalize_code(code):
+    return code.replace('-', '').replace(' ', '').upper()
+
+
+def hash_code(code):
+    return salted_hmac('api.courses.access_codes', normalize_code(code), algorithm='sha256').hexdigest()
+
+
+def issue_codes(count, kind, course=None, days=None, created_by=None):
+    """
+    Create `count` access codes in one transaction and return them in plain
+    text, the only time they are available.
+    """
+    if not 0 < count <= settings.ACCESS_CODES['MAX_ISSUE_COUNT']:
+        raise AccessCodeError(f"Issue between 1 and {settings.ACCESS_CODES['MAX_ISSUE_COUNT']} codes at a time.")
+    if kind == AccessCode.Kind.COURSE and course is None:
+        raise AccessCodeError('Course codes need a course.')
+    if kind == AccessCode.Kind.TEST and not days:
+        raise AccessCodeError('Test codes need a number of days.')
+
+    codes = {}
+    while len(codes) < count:
+        code = generate_code()
+        codes[hash_code(code)] = code
+    with transaction.atomic():
+        AccessCode.objects.bulk_create(
+            [AccessCode(code_hash=code_hash, kind=kind, course=course, days=days, created_by=created_by)
+             for code_hash in codes],
+            batch_size=settings.ACCESS_CODES['BATCH_SIZE'])
+    return list(codes.values())
+
+
+def redeem_code(user_id, code):
+    """
+    Spend a code for the user and apply what it grants, all in one transaction.
+    The code is claimed with a conditional UPDATE, so concurrent redemptions of
+    the same code cannot both succeed.
+    """
+    code_hash = hash_code(code)
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = AccessCode.objects.filter(code_hash=code_hash, redeemed_at__isnull=True).update(
+            redeemed_at=now, redeemed_by_id=user_id)
+        if not claimed:
+            raise AccessCodeError('This code is invalid or has already been used.')
+        access_code = AccessCode.objects.get(code_hash=code_hash)
+
+        if access_code.kind == AccessCode.Kind.COURSE:
+            _, created = BoughtCourse.objects.get_or_create(user_id=user_id, course_id=access_code.course_id)
+            if not created:
+                # Rolls the claim back, the code stays usable.
+                raise AccessCodeError('You already have this course.')
+        else:
+            # Extends an unexpired limit, otherwise starts from now.
+            Profile.objects.filter(user_id=user_id).update(
+                test_limit=Greatest('test_limit', now) + timedelta(days=access_code.days))
+            transaction.on_commit(functools.partial(bump_profile_version, user_id))
+        # Signals drop the cache before commit, a concurrent read could cache the old entitlements again.
+        transaction.on_commit(functools.partial(invalidate_entitlements, user_id))
+    return access_code
@@ -0,0 +1,18 @@
+from api.cache import VersionedCache
+
+course_cache = VersionedCache('courses')
+
+CATALOG_NAMESPACE = 'catalog'
+
+
+def course_namespace(course_id):
+    return f'course-{course_id}'
+
+
+def bump_course_version(course_id):
+    if course_id is not None:
+        course_cache.bump(course_namespace(course_id))
+
+
+def bump_catalog_version():
+    course_cache.bump(CATALOG_NAMESPACE)
@@ -0,0 +1,117 @@
+import datetime
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+from pytube import YouTube
+
+from api.courses.models import Lesson
+
+logger = logging.getLogger(__name__)
+
+VIDEO_ID_RE = re.compile(r'(?:v=|/embed/|/shorts/|/live/|youtu\.be/|/v/)([0-9A-Za-z_-]{11})')
+
+
+class PytubeDurationResolver:
+    """
+    Fetch the length of a YouTube video with pytube.
+    """
+
+    def __call__(self, video_link):
+        return datetime.timedelta(seconds=YouTube(video_link).length)
+
+
+def get_resolver():
+    return import_string(settings.LESSON_DURATIONS['RESOLVER'])()
+
+
+def extract_video_id(video_link):
+    match = VIDEO_ID_RE.search(video_link)
+    return match.group(1) if match else video_link
+
+
+def resolve_duration(video_link, resolver=None):
+    """
+    Return the duration of a video, memoized per video ID for LESSON_DURATIONS['CACHE_TTL'] seconds.
+    """
+    options = settings.LESSON_DURATIONS
+    cache = caches[options['CACHE_ALIAS']]
+    cache_key = f'courses:video-duration:{extract_video_id(video_link)}'
+
+    seconds = cache.get(cache_key)
+    if seconds is None:
+        resolver = resolver or get_resolver()
+        seconds = int(resolver(video_link).total_seconds())
+        cache.set(cache_key, seconds, timeout=options['CACHE_TTL'])
+    return datetime.timedelta(seconds=seconds)
+
+
+def _store_duration(lesson_id, video_link, duration):
+    with transaction.atomic():
+        lesson = Lesson.objects.select_for_update().filter(pk=lesson_id).first()
+        # The link changed while we were fetching, a newer job owns the lesson now.
+        if lesson is None or lesson.video_link != video_link:
+            return None
+        if duration is None:
+            lesson.duration_status = Lesson.DurationStatus.FAILED
+        else:
+            lesson.duration = duration
+            lesson.duration_status = Lesson.DurationStatus.RESOLVED
+        lesson.save(update_fields=['duration', 'duration_status'])
+        return lesson
+
+
+def _resolve_or_none(video_link, resolver):
+    try:
+        return resolve_duration(video_link, resolver)
+    except Exception:
+        logger.exception('Could not resolve the duration of %s', video_link)
+        return None
+
+
+def resolve_lesson_duration(lesson_id, resolver=None, mark_failed=True):
+    """
+    Fill in the duration of a pending lesson. When the video cannot be resolved
+    the lesson is marked as failed, or the error is raised if not `mark_failed`.
+    """
+    video_link = Lesson.objects.filter(pk=lesson_id).values_list('video_link', flat=True).first()
+    if video_link is None:
+        return None
+    if mark_failed:
+        duration = _resolve_or_none(video_link, resolver)
+    else:
+        duration = resolve_duration(video_link, resolver)
+    return _store_duration(lesson_id, video_link, duration)
+
+
+def resolve_course_durations(course, max_workers=None, resolver=None):
+    """
+    Re-resolve the durations of every lesson of a course, fetching at most
+    max_workers videos at a time. Returns the number of resolved lessons.
+    """
+    resolver = resolver or get_resolver()
+    max_workers = max_workers or settings.LESSON_DURATIONS['MAX_WORKERS']
+    lessons = list(Lesson.objects.filter(course_theme__course=course).values_list('id', 'video_link'))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        durations = executor.map(lambda link: _resolve_or_none(link, resolver), [link for _, link in lessons])
+        durations = list(durations)
+
+    resolved = 0
+    for (lesson_id, video_link), duration in zip(lessons, durations):
+        if _store_duration(lesson_id, video_link, duration) and duration is not None:
+            resolved += 1
+    return resolved
+
+
+def enqueue_duration_resolution(lesson_id):
+    """
+    Resolve the duration of a lesson on the task queue once the current transaction commits.
+    """
+    from api.courses.tasks import resolve_lesson_duration_task
+
+    transaction.on_commit(lambda: resolve_lesson_duration_task.delay(lesson_id))
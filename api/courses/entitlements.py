@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from api.cache import is_process_local
+from api.courses.models import BoughtCourse
+from api.users.models import Profile
+
+Entitlements = namedtuple('Entitlements', ['course_ids', 'test_limit'])
+
+NO_ENTITLEMENTS = Entitlements(frozenset(), None)
+
+
+def _cache_key(user_id):
+    return f'courses:entitlements:{user_id}'
+
+
+def load_entitlements(user_id):
+    """
+    Read what the user has paid for from the database.
+    """
+    course_ids = frozenset(BoughtCourse.objects.filter(user_id=user_id).values_list('course_id', flat=True))
+    test_limit = Profile.objects.filter(user_id=user_id).values_list('test_limit', flat=True).first()
+    return Entitlements(course_ids, test_limit)
+
+
+def get_entitlements(user):
+    """
+    Return the purchased course ids and quiz access limit of a user, cached
+    per user for ENTITLEMENTS['TIMEOUT'] seconds. invalidate_entitlements()
+    only reaches other workers through a shared cache, with a process-local
+    one entries live ENTITLEMENTS['LOCAL_TIMEOUT'] seconds instead.
+    """
+    if not user or not user.is_authenticated:
+        return NO_ENTITLEMENTS
+    options = settings.ENTITLEMENTS
+    cache = caches[options['CACHE_ALIAS']]
+    entitlements = cache.get(_cache_key(user.id))
+    if entitlements is None:
+        entitlements = load_entitlements(user.id)
+        timeout = options['LOCAL_TIMEOUT'] if is_process_local(cache) else options['TIMEOUT']
+        cache.set(_cache_key(user.id), entitlements, timeout=timeout)
+    return entitlements
+
+
+def invalidate_entitlements(user_id):
+    """
+    Drop the cached entitlements of a user. Call it after changing purchases
+    or the quiz access limit without model signals, e.g. with update().
+    """
+    caches[settings.ENTITLEMENTS['CACHE_ALIAS']].delete(_cache_key(user_id))
+
+
+def owns_course(user, course_id):
+    return course_id in get_entitlements(user).course_ids
+
+
+def has_test_access(user):
+    """
+    Whether the user may take paid (non-trial) quizzes right now.
+    """
+    if user and user.is_superuser:
+        return True
+    # A signed test_limit claim that has not expired yet answers without a cache
+    # round trip, otherwise the cached limit picks up purchases made since the token was issued.
+    claimed_limit = getattr(user, 'test_limit', None)
+    if claimed_limit is not None and claimed_limit > timezone.now():
+        return True
+    test_limit = get_entitlements(user).test_limit
+    return test_limit is not None and test_limit > timezone.now()
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from api.courses.access_codes import AccessCodeError, hash_code, issue_codes, redeem_code
+from api.courses.models import AccessCode
+from api.users.models import Profile, Role, User
+
+
+class Command(BaseCommand):
+    help = ('Measure access code issuance and concurrent redemption, checking that no code is spent twice. '
+            'Creates throwaway codes and users and deletes them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000, help='Codes issued in one batch')
+        parser.add_argument('--redeem', type=int, default=200, help='Codes redeemed concurrently')
+        parser.add_argument('--attempts', type=int, default=4, help='Users racing for each code')
+        parser.add_argument('--concurrency', type=int, default=16, help='Redeeming threads')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        codes = issue_codes(options['count'], AccessCode.Kind.TEST, days=1)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Issued {len(codes)} codes in {elapsed:.2f}s ({len(codes) / elapsed:.0f} codes/s)')
+
+        role = Role.objects.get(name='student')
+        users = User.objects.bulk_create([
+            User(email=f'access-code-bench-{i}@natije.invalid', first_name='Bench', last_name=str(i),
+                 role=role, password='!')
+            for i in range(options['attempts'])
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        try:
+            self.race(codes[:options['redeem']], users, options)
+        finally:
+            AccessCode.objects.filter(code_hash__in=[hash_code(code) for code in codes]).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def race(self, codes, users, options):
+        def redeem(args):
+            user_id, code = args
+            try:
+                redeem_code(user_id, code)
+                return 'redeemed'
+            except AccessCodeError:
+                return 'rejected'
+            except DatabaseError:
+                return 'error'
+            finally:
+                connection.close()
+
+        attempts = [(user.pk, code) for code in codes for user in users]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(redeem, attempts))
+        elapsed = time.perf_counter() - started
+
+        redeemed = results.count('redeemed')
+        spent = AccessCode.objects.filter(code_hash__in=[hash_code(code) for code in codes],
+                                          redeemed_at__isnull=False).count()
+        self.stdout.write(f'{len(attempts)} redemptions of {len(codes)} codes in {elapsed:.2f}s '
+                          f'({len(attempts) / elapsed:.0f}/s): {redeemed} redeemed, '
+                          f'{results.count("rejected")} rejected, {results.count("error")} database errors')
+        if redeemed == spent and redeemed <= len(codes):
+            self.stdout.write(self.style.SUCCESS('No code was spent twice'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{redeemed} successful redemptions for {spent} spent codes'))
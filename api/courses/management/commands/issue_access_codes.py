@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.courses.access_codes import AccessCodeError, issue_codes
+from api.courses.models import AccessCode, Course
+
+
+class Command(BaseCommand):
+    help = 'Issue a batch of single-use course or quiz access codes and print them, one per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--course', help='Course name, for course codes')
+        parser.add_argument('--days', type=int, help='Days of quiz access, for test codes')
+        parser.add_argument('--output', help='Write the codes to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if bool(options['course']) == bool(options['days']):
+            raise CommandError('Pass either --course or --days')
+        course = None
+        if options['course']:
+            course = Course.objects.filter(name=options['course']).first()
+            if course is None:
+                raise CommandError(f'Course "{options["course"]}" does not exist')
+        kind = AccessCode.Kind.COURSE if course else AccessCode.Kind.TEST
+
+        try:
+            codes = issue_codes(options['count'], kind, course=course, days=options['days'])
+        except AccessCodeError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write('\n'.join(codes) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(codes)} codes to {options["output"]}'))
+        else:
+            self.stdout.write('\n'.join(codes))
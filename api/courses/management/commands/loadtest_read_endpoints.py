@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Load test the read endpoints: sync views on a WSGI server against their '
+            'async counterparts on an ASGI server')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='e.g. gunicorn natije.wsgi')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001', help='e.g. uvicorn natije.asgi:application')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and server')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--course', help='Course name for the syllabus endpoint')
+        parser.add_argument('--quiz', type=int, help='Quiz id for the payload endpoint')
+        parser.add_argument('--token', help='Access token for the quiz payload and profile endpoints')
+
+    def get_endpoints(self, options):
+        endpoints = [('catalog', '/api/courses/', '/api/courses/async/')]
+        if options['course']:
+            endpoints.append(('syllabus', f'/api/courses/{options["course"]}/themes/',
+                              f'/api/courses/async/{options["course"]}/themes/'))
+        if options['quiz']:
+            endpoints.append(('quiz payload', f'/api/quizzes/{options["quiz"]}/full/',
+                              f'/api/quizzes/async/{options["quiz"]}/full/'))
+        if options['token']:
+            endpoints.append(('profile', '/api/users/profile/', '/api/users/async/profile/'))
+        return endpoints
+
+    def run(self, url, options):
+        local = threading.local()
+        headers = {'Authorization': f'Bearer {options["token"]}'} if options['token'] else {}
+
+        def fetch(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                ok = local.session.get(url, headers=headers, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for ok, _ in results if not ok)
+        return len(results) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], errors
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+
+        self.stdout.write(f'{options["requests"]} requests per endpoint, {options["concurrency"]} concurrent')
+        self.stdout.write(f'{"endpoint":<14} {"server":<6} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"errors":>7}')
+        for name, sync_path, async_path in self.get_endpoints(options):
+            throughputs = []
+            for server, url in (('wsgi', options['wsgi_url'] + sync_path), ('asgi', options['asgi_url'] + async_path)):
+                throughput, p50, p95, errors = self.run(url, options)
+                throughputs.append(throughput)
+                self.stdout.write(f'{name:<14} {server:<6} {throughput:>9.1f} {p50 * 1000:>9.1f} '
+                                  f'{p95 * 1000:>9.1f} {errors:>7}')
+            self.stdout.write(f'{name:<14} asgi/wsgi throughput: {throughputs[1] / throughputs[0]:.2f}x')
@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from api.courses.models import Course, CourseTheme, Lesson
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stored lesson counts and durations of courses and themes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not write')
+
+    def handle(self, *args, **options):
+        theme_stats = {
+            row['course_theme']: (row['count'], row['duration'] or datetime.timedelta())
+            for row in Lesson.objects.values('course_theme').annotate(count=Count('id'), duration=Sum('duration'))
+        }
+
+        drifted_themes = []
+        for theme in CourseTheme.objects.only('id', 'title', 'lesson_count', 'total_duration'):
+            count, duration = theme_stats.get(theme.id, (0, datetime.timedelta()))
+            if (theme.lesson_count, theme.total_duration) != (count, duration):
+                self.stdout.write(self.style.WARNING(
+                    f'Theme "{theme.title}": {theme.lesson_count} lessons / {theme.total_duration} '
+                    f'stored, {count} lessons / {duration} actual'
+                ))
+                theme.lesson_count, theme.total_duration = count, duration
+                drifted_themes.append(theme)
+
+        drifted_courses = []
+        for course in Course.objects.with_lesson_stats().only('id', 'name', 'lesson_count', 'total_duration'):
+            count, duration = course.computed_lesson_count, course.computed_total_duration
+            if (course.lesson_count, course.total_duration) != (count, duration):
+                self.stdout.write(self.style.WARNING(
+                    f'Course "{course.name}": {course.lesson_count} lessons / {course.total_duration} '
+                    f'stored, {count} lessons / {duration} actual'
+                ))
+                course.lesson_count, course.total_duration = count, duration
+                drifted_courses.append(course)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted_courses)} courses and {len(drifted_themes)} themes drifted')
+            return
+
+        with transaction.atomic():
+            CourseTheme.objects.bulk_update(drifted_themes, ['lesson_count', 'total_duration'])
+            Course.objects.bulk_update(drifted_courses, ['lesson_count', 'total_duration'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats, fixed {len(drifted_courses)} courses and {len(drifted_themes)} themes'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.courses.durations import resolve_course_durations
+from api.courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Re-resolve YouTube durations of all lessons of a course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_name')
+        parser.add_argument('--workers', type=int, default=None, help='Videos fetched in parallel')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(name=options['course_name']).first()
+        if course is None:
+            raise CommandError(f'Course "{options["course_name"]}" does not exist')
+        resolved = resolve_course_durations(course, max_workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Resolved {resolved} of {course.lesson_count} lessons'))
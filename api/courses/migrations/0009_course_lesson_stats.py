@@ -0,0 +1,62 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:11
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_lesson_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseTheme = apps.get_model('courses', 'CourseTheme')
+    for model, lessons in ((CourseTheme, 'lesson'), (Course, 'coursetheme__lesson')):
+        rows = list(model.objects.annotate(count=Count(lessons), duration=Sum(f"{lessons}__duration")))
+        for row in rows:
+            row.lesson_count = row.count
+            row.total_duration = row.duration or datetime.timedelta()
+        model.objects.bulk_update(rows, ['lesson_count', 'total_duration'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_remove_course_bought_user_boughtcourse_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='lesson',
+            name='date_published',
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_duration',
+            field=models.DurationField(default=datetime.timedelta, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursetheme',
+            name='description',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursetheme',
+            name='lesson_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursetheme',
+            name='total_duration',
+            field=models.DurationField(default=datetime.timedelta, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='lesson_number',
+            field=models.IntegerField(db_index=True, null=True, unique=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(fill_lesson_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:13
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_lesson_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='duration_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('resolved', 'Resolved'), ('failed', 'Failed')], default='resolved', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='duration',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:21
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_purchases(apps, schema_editor):
+    BoughtCourse = apps.get_model('courses', 'BoughtCourse')
+    keep = BoughtCourse.objects.values('user', 'course').annotate(keep_id=Min('id')).values_list('keep_id', flat=True)
+    BoughtCourse.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_lesson_duration_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lesson',
+            name='lesson_number',
+            field=models.IntegerField(null=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(remove_duplicate_purchases, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='boughtcourse',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_bought_course'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course_theme', 'lesson_number'), name='unique_lesson_number'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import datetime
+
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
 
 from api.users.models import User
 
@@ -8,11 +12,48 @@ class BoughtCourse(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey('Course', on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_bought_course'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} bought {self.course.name}"
 
 
-class Course(models.Model):
+class CourseQuerySet(models.QuerySet):
+    def with_lesson_stats(self):
+        """
+        Annotate each course with its lesson count and total lesson duration
+        aggregated from the lessons themselves.
+        """
+        return self.annotate(
+            computed_lesson_count=Count('coursetheme__lesson'),
+            computed_total_duration=Coalesce(Sum('coursetheme__lesson__duration'), Value(datetime.timedelta())),
+        )
+
+
+class LessonStatsModel(models.Model):
+    """
+    Lesson count and total duration kept current by api.courses.signals.
+    """
+    lesson_count = models.IntegerField(default=0, editable=False)
+    total_duration = models.DurationField(default=datetime.timedelta, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Never write back stats loaded with the instance, they may be stale by now.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('lesson_count', 'total_duration')
+            ]
+        super().save(*args, **kwargs)
+
+
+class Course(LessonStatsModel):
     name = models.CharField(max_length=255, unique=True, db_index=True)
     description = models.TextField()
     price = models.DecimalField(validators=[MinValueValidator(0)], decimal_places=2, max_digits=10)
@@ -21,11 +62,19 @@ class Course(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses')
     bought_users = models.ManyToManyField(User, through=BoughtCourse, related_name='bought_courses')
 
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The catalog's keyset pagination order, see api.courses.pagination.
+            models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class CourseTheme(models.Model):
+class CourseTheme(LessonStatsModel):
     title = models.CharField(max_length=255, null=False, unique=True, db_index=True)
     description = models.CharField(max_length=255, blank=True)
     date_published = models.DateTimeField(auto_now_add=True)
@@ -36,13 +85,25 @@ class CourseTheme(models.Model):
 
 
 class Lesson(models.Model):
+    class DurationStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RESOLVED = 'resolved', 'Resolved'
+        FAILED = 'failed', 'Failed'
+
     title = models.CharField(max_length=255, null=False, db_index=True)
-    lesson_number = models.IntegerField(validators=[MinValueValidator(0)], db_index=True, unique=True, null=True)
+    lesson_number = models.IntegerField(validators=[MinValueValidator(0)], null=True)
     video_link = models.URLField(null=False)
-    duration = models.DurationField()
+    duration = models.DurationField(default=datetime.timedelta)
+    duration_status = models.CharField(max_length=10, choices=DurationStatus.choices,
+                                       default=DurationStatus.RESOLVED)
     is_prime = models.BooleanField(default=True)
     course_theme = models.ForeignKey(CourseTheme, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course_theme', 'lesson_number'], name='unique_lesson_number'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -55,3 +116,34 @@ class LessonMaterial(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class AccessCode(models.Model):
+    """
+    A single-use code that grants a course or days of quiz access, see
+    api.courses.access_codes. Only an HMAC of the code is stored.
+    """
+    class Kind(models.TextChoices):
+        COURSE = 'course', 'Course'
+        TEST = 'test', 'Test'
+
+    code_hash = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True)
+    days = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='issued_access_codes')
+    redeemed_at = models.DateTimeField(null=True, blank=True)
+    redeemed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='redeemed_access_codes')
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(kind='course', course__isnull=False) | models.Q(kind='test', days__isnull=False),
+                name='access_code_grants_something'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} code {self.code_hash[:8]}"
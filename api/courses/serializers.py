@@ -1,8 +1,8 @@
-import datetime
-from pytube import YouTube
-from datetime import timedelta
+from django.db import transaction
 from rest_framework import serializers, exceptions
+from .durations import enqueue_duration_resolution
 from .models import Course, CourseTheme, Lesson, LessonMaterial
+from .utils import format_duration
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -26,35 +26,18 @@ class CourseSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get("request")
         if request:
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         return False
 
     def get_number_of_lessons(self, obj):
-        try:
-            lessons_count = Lesson.objects.filter(course_theme__course=obj).count()
-            return lessons_count
-        except CourseTheme.DoesNotExist:
-            return 0
+        return obj.lesson_count
 
     def get_duration(self, obj):
-        try:
-            lessons = Lesson.objects.filter(course_theme__course=obj)
-            total_duration = timedelta(hours=0, minutes=0)
-
-            for lesson in lessons:
-                total_duration += lesson.duration
-
-            hours, remainder = divmod(total_duration.seconds, 3600)
-            minutes, _ = divmod(remainder, 60)
-            duration_str = "{:02}:{:02}".format(hours, minutes)
-
-            return duration_str
-        except Lesson.DoesNotExist:
-            return "00:00"
+        return format_duration(obj.total_duration)
 
     def update(self, instance, validated_data):
         user = self.context['request'].user
-        if instance.user != user:
+        if instance.user_id != user.id:
             raise exceptions.PermissionDenied
 
         instance.name = validated_data.get('name', instance.name)
@@ -66,9 +49,22 @@ class CourseSerializer(serializers.ModelSerializer):
         return instance
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        course = Course.objects.create(**validated_data, user=user)
-        return course
+        # request.user is a ClaimsUser, not a User instance.
+        validated_data['user_id'] = self.context['request'].user.id
+        return Course.objects.create(**validated_data)
+
+
+class CourseListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Course
+        fields = ['id', 'image', 'name', 'price']
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
 
 class CourseThemeSerializer(serializers.ModelSerializer):
@@ -90,56 +86,48 @@ class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = '__all__'
-        read_only_fields = ['course_theme', 'duration']
+        read_only_fields = ['course_theme', 'duration', 'duration_status']
 
     def create(self, validated_data):
         video_link = validated_data.get('video_link')
 
         if not video_link:
             raise serializers.ValidationError({'video_link': ['Video link is required.']})
-        try:
-            youtube = YouTube(video_link)
-            duration_seconds = youtube.length
-            print(duration_seconds)
-            video_time = datetime.timedelta(seconds=duration_seconds)
-        except Exception as e:
-            raise serializers.ValidationError({'video_link': [str(e)]})
+        validated_data['duration_status'] = Lesson.DurationStatus.PENDING
 
         lesson_number = validated_data.get('lesson_number')
         if lesson_number:
-            lesson, created = Lesson.objects.get_or_create(lesson_number=lesson_number,
-                                                           defaults={'duration': video_time, **validated_data})
-            if created:
-                return lesson
-            else:
+            lesson, created = Lesson.objects.get_or_create(course_theme=validated_data.get('course_theme'),
+                                                           lesson_number=lesson_number, defaults=validated_data)
+            if not created:
                 raise serializers.ValidationError({'message': ['Қате. Бұл нөмерлі сабақ бар!']})
-        lesson = Lesson.objects.create(duration=video_time, **validated_data)
+        else:
+            lesson = Lesson.objects.create(**validated_data)
+        enqueue_duration_resolution(lesson.pk)
         return lesson
 
     def update(self, instance, validated_data):
         video_link = validated_data.get('video_link')
-
-        if not video_link:
-            raise serializers.ValidationError({'video_link': ['Video link is required.']})
-
-        try:
-            youtube = YouTube(video_link)
-            duration_seconds = youtube.length
-            instance.duration = datetime.timedelta(seconds=duration_seconds)
-        except Exception as e:
-            raise serializers.ValidationError({'video_link': [str(e)]})
+        link_changed = bool(video_link) and video_link != instance.video_link
+        if link_changed:
+            instance.video_link = video_link
+            instance.duration_status = Lesson.DurationStatus.PENDING
 
         instance.title = validated_data.get('title', instance.title)
         lesson_number = validated_data.get('lesson_number')
         if lesson_number is not None:
             if not isinstance(lesson_number, int) or lesson_number < 0:
                 raise serializers.ValidationError({'lesson_number': ['Lesson number must be a non-negative integer.']})
-            lesson = Lesson.objects.get(lesson_number=lesson_number)
-            if lesson:
+            taken = Lesson.objects.filter(course_theme_id=instance.course_theme_id, lesson_number=lesson_number)
+            if taken.exclude(pk=instance.pk).exists():
                 raise serializers.ValidationError({"message": "Қате. Бұл нөмерлі сабақ бар!"})
             instance.lesson_number = lesson_number
 
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            # Resolves the saved link once the pending status is committed.
+            if link_changed:
+                enqueue_duration_resolution(instance.pk)
         return instance
 
 
@@ -148,3 +136,7 @@ class LessonMaterialSerializer(serializers.ModelSerializer):
         model = LessonMaterial
         fields = '__all__'
         read_only_fields = ['lesson']
+
+
+class RedeemAccessCodeSerializer(serializers.Serializer):
+    code = serializers.CharField(max_length=32)
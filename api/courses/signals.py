@@ -0,0 +1,143 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from api.courses.cache import bump_course_version, bump_catalog_version
+from api.courses.entitlements import invalidate_entitlements
+from api.courses.models import BoughtCourse, Course, CourseTheme, Lesson, LessonMaterial
+from api.users.models import Profile
+
+
+def apply_lesson_delta(course_theme_id, count, duration):
+    """
+    Shift the stored lesson aggregates of a theme and its course.
+    """
+    if not count and not duration:
+        return
+    changes = {
+        'lesson_count': F('lesson_count') + count,
+        'total_duration': F('total_duration') + duration,
+    }
+    with transaction.atomic():
+        CourseTheme.objects.filter(pk=course_theme_id).update(**changes)
+        Course.objects.filter(coursetheme__pk=course_theme_id).update(**changes)
+
+
+def _lesson_snapshot(lesson):
+    # Read through __dict__ so deferred fields are not fetched.
+    return lesson.__dict__.get('course_theme_id'), lesson.__dict__.get('duration') or datetime.timedelta()
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_stats(sender, instance, **kwargs):
+    instance._stats_snapshot = _lesson_snapshot(instance)
+
+
+@receiver(post_save, sender=Lesson)
+def update_stats_on_lesson_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_theme_id, old_duration = (None, datetime.timedelta()) if created else instance._stats_snapshot
+    new_theme_id, new_duration = _lesson_snapshot(instance)
+
+    if old_theme_id == new_theme_id:
+        apply_lesson_delta(new_theme_id, 0, new_duration - old_duration)
+    else:
+        if old_theme_id is not None:
+            apply_lesson_delta(old_theme_id, -1, -old_duration)
+        apply_lesson_delta(new_theme_id, 1, new_duration)
+
+
+@receiver(post_delete, sender=Lesson)
+def update_stats_on_lesson_delete(sender, instance, **kwargs):
+    course_theme_id, duration = instance._stats_snapshot
+    apply_lesson_delta(course_theme_id, -1, -duration)
+
+
+@receiver(post_init, sender=CourseTheme)
+def remember_theme_course(sender, instance, **kwargs):
+    instance._stats_course_id = instance.__dict__.get('course_id')
+
+
+@receiver(post_save, sender=CourseTheme)
+def move_stats_on_theme_save(sender, instance, created, raw=False, **kwargs):
+    old_course_id = instance._stats_course_id
+    if raw or created or old_course_id == instance.course_id:
+        return
+    stats = CourseTheme.objects.filter(pk=instance.pk).values('lesson_count', 'total_duration').get()
+    with transaction.atomic():
+        Course.objects.filter(pk=old_course_id).update(
+            lesson_count=F('lesson_count') - stats['lesson_count'],
+            total_duration=F('total_duration') - stats['total_duration'],
+        )
+        Course.objects.filter(pk=instance.course_id).update(
+            lesson_count=F('lesson_count') + stats['lesson_count'],
+            total_duration=F('total_duration') + stats['total_duration'],
+        )
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_cache_on_course_change(sender, instance, **kwargs):
+    bump_course_version(instance.pk)
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=CourseTheme)
+@receiver(post_delete, sender=CourseTheme)
+def bump_course_cache_on_theme_change(sender, instance, **kwargs):
+    bump_course_version(instance.course_id)
+    if instance._stats_course_id != instance.course_id:
+        bump_course_version(instance._stats_course_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def bump_course_cache_on_lesson_change(sender, instance, **kwargs):
+    theme_ids = {instance.course_theme_id, instance._stats_snapshot[0]}
+    for course_id in CourseTheme.objects.filter(pk__in=theme_ids).values_list('course_id', flat=True):
+        bump_course_version(course_id)
+
+
+@receiver(post_save, sender=LessonMaterial)
+@receiver(post_delete, sender=LessonMaterial)
+def bump_course_cache_on_material_change(sender, instance, **kwargs):
+    course_id = Lesson.objects.filter(pk=instance.lesson_id).values_list('course_theme__course_id', flat=True).first()
+    bump_course_version(course_id)
+
+
+@receiver(post_save, sender=BoughtCourse)
+@receiver(post_delete, sender=BoughtCourse)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_entitlements_on_change(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
+
+
+@receiver(m2m_changed, sender=BoughtCourse)
+def invalidate_entitlements_on_bought_users_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # course.bought_users.add()/remove()/clear() bypass the BoughtCourse model signals.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(BoughtCourse.objects.filter(course=instance).values_list('user_id', flat=True))
+    else:
+        user_ids = pk_set
+    for user_id in user_ids:
+        invalidate_entitlements(user_id)
+
+
+# Connected last so that the receivers above still see the previous values.
+@receiver(post_save, sender=Lesson)
+def refresh_lesson_snapshot(sender, instance, **kwargs):
+    instance._stats_snapshot = _lesson_snapshot(instance)
+
+
+@receiver(post_save, sender=CourseTheme)
+def refresh_theme_snapshot(sender, instance, **kwargs):
+    instance._stats_course_id = instance.course_id
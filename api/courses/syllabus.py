@@ -0,0 +1,51 @@
+import datetime
+
+from django.db.models import Prefetch
+
+from api.courses.models import Course, CourseTheme, Lesson
+from api.courses.serializers import CourseSerializer
+from api.courses.utils import format_duration
+
+
+def get_syllabus_queryset():
+    """
+    Course queryset with themes and their lessons prefetched,
+    so a syllabus costs three queries regardless of its size.
+    """
+    lessons = Lesson.objects.order_by('lesson_number')
+    themes = CourseTheme.objects.order_by('id').prefetch_related(Prefetch('lesson_set', queryset=lessons))
+    return Course.objects.prefetch_related(Prefetch('coursetheme_set', queryset=themes))
+
+
+def build_syllabus(course):
+    """
+    Assemble the syllabus payload of a course fetched with get_syllabus_queryset().
+    """
+    course_theme_data = []
+
+    for course_theme in course.coursetheme_set.all():
+        lessons = course_theme.lesson_set.all()
+        temp_response_lesson = []
+        temp_duration_of_theme = datetime.timedelta()
+
+        for idx, lesson in enumerate(lessons, start=1):
+            temp_response_lesson.append({
+                "id": lesson.id,
+                "title": lesson.title,
+                "link": lesson.video_link,
+                "lesson_number": idx,
+                "duration": format_duration(lesson.duration),
+                "is_prime": lesson.is_prime
+            })
+            temp_duration_of_theme += lesson.duration
+
+        course_theme_data.append({
+            "title": course_theme.title,
+            "count_lessons": len(lessons),
+            "duration": format_duration(temp_duration_of_theme),
+            'lessons': temp_response_lesson
+        })
+
+    course_serializer = CourseSerializer(course).data
+    course_serializer['course_themes'] = course_theme_data
+    return course_serializer
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from api.courses.durations import resolve_lesson_duration
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), max_retries=3, retry_backoff=30, retry_backoff_max=60 * 10)
+def resolve_lesson_duration_task(self, lesson_id):
+    """
+    Fill in the duration of a lesson, retrying with backoff while YouTube
+    fails. The last attempt marks the lesson as failed instead.
+    """
+    resolve_lesson_duration(lesson_id, mark_failed=self.request.retries >= self.max_retries)
@@ -1,2 +1,509 @@
-from django.test import TestCase
+import datetime
+import io
+import re
+import unittest
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.cache import LRUCache
+from api.courses.access_codes import AccessCodeError, hash_code, issue_codes, redeem_code
+from api.courses.cache import course_cache
+from api.courses.durations import resolve_course_durations
+from api.courses.entitlements import has_test_access, owns_course
+from api.courses.models import AccessCode, BoughtCourse, Course, CourseTheme, Lesson, LessonMaterial
+from api.courses.serializers import LessonSerializer
+from api.courses.syllabus import build_syllabus, get_syllabus_queryset
+from api.courses.tasks import resolve_lesson_duration_task
+from api.users.models import Role, User
+
+
+class CourseFixtureMixin:
+    def setUp(self):
+        caches[course_cache.alias].clear()
+        course_cache.clear_local()
+        role = Role.objects.create(name='teacher')
+        self.user = User.objects.create_user(email='teacher@natije.kz', password='secret',
+                                             first_name='Test', last_name='Teacher', role=role)
+        self.course = Course.objects.create(name='Math', description='Algebra', price=100,
+                                            image='medias/courses/images/math.png', user=self.user)
+        self.theme = CourseTheme.objects.create(title='Equations', course=self.course)
+        self.lesson = Lesson.objects.create(title='Linear', lesson_number=1, video_link='https://youtu.be/abc',
+                                            duration=datetime.timedelta(minutes=30), course_theme=self.theme)
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+
+class CourseResponseCacheTests(CourseFixtureMixin, TestCase):
+    syllabus_url = '/api/courses/Math/themes/'
+
+    def test_syllabus_is_served_from_cache(self):
+        first = self.client.get(self.syllabus_url)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.syllabus_url)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_syllabus_request_returns_304(self):
+        response = self.client.get(self.syllabus_url)
+        not_modified = self.client.get(self.syllabus_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        not_modified = self.client.get(self.syllabus_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_lesson_and_material_changes_invalidate_syllabus(self):
+        etag = self.client.get(self.syllabus_url)['ETag']
+
+        self.lesson.title = 'Quadratic'
+        self.lesson.save()
+        response = self.client.get(self.syllabus_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['course_themes'][0]['lessons'][0]['title'], 'Quadratic')
+
+        etag = response['ETag']
+        LessonMaterial.objects.create(title='Notes', lesson=self.lesson)
+        self.assertNotEqual(self.client.get(self.syllabus_url)['ETag'], etag)
+
+    def test_async_views_serve_the_same_data(self):
+        for url, async_url in ((self.syllabus_url, '/api/courses/async/Math/themes/'),
+                               ('/api/courses/', '/api/courses/async/')):
+            response = self.client.get(async_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), self.client.get(url).json())
+            self.assertEqual(self.client.get(async_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/courses/async/Missing/themes/').status_code, 404)
+
+    def test_course_save_invalidates_catalog(self):
+        response = self.client.get('/api/courses/')
+        self.assertEqual([course['name'] for course in response.json()['results']], ['Math'])
+
+        self.course.name = 'Algebra'
+        self.course.save()
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['name'] for course in response.json()['results']], ['Algebra'])
+
+    def test_catalog_is_keyed_on_the_parameters_that_shape_it(self):
+        Course.objects.create(name='Physics', description='Mechanics', price=100,
+                              image='medias/courses/images/physics.png', user=self.user)
+        first = self.client.get('/api/courses/?page_size=1&utm_source=mail')
+        self.assertNotIn('utm_source', first.json()['next'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/courses/?utm_source=ad&page_size=1')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertNotEqual(self.client.get('/api/courses/?page_size=2')['ETag'], first['ETag'])
+
+    def test_last_modified_is_not_earlier_than_the_change(self):
+        with mock.patch.object(course_cache, 'get_version', return_value=(1, 1000.2)):
+            response = self.client.get('/api/courses/', HTTP_IF_MODIFIED_SINCE=http_date(1000))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(1001))
+
+
+class CourseQueryCountTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for theme_number in range(3):
+            theme = CourseTheme.objects.create(title=f'Theme {theme_number}', course=self.course)
+            for lesson_number in range(4):
+                Lesson.objects.create(title=f'Lesson {lesson_number}', lesson_number=lesson_number,
+                                      video_link='https://youtu.be/abc', duration=datetime.timedelta(minutes=5),
+                                      course_theme=theme)
+        for name in ('Physics', 'Biology', 'Chemistry'):
+            Course.objects.create(name=name, description=name, price=100,
+                                  image=f'medias/courses/images/{name.lower()}.png', user=self.user)
+
+    def test_uncached_syllabus_is_a_fixed_number_of_queries(self):
+        # The course id, then the course, its themes and their lessons.
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/courses/Math/themes/')
+        themes = response.json()['course_themes']
+        self.assertEqual([theme['count_lessons'] for theme in themes], [1, 4, 4, 4])
+
+        with self.assertNumQueries(3):
+            build_syllabus(get_syllabus_queryset().get(pk=self.course.pk))
+
+    def test_uncached_catalog_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_lesson_stats_are_aggregated_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = {course.name: (course.computed_lesson_count, course.computed_total_duration)
+                     for course in Course.objects.with_lesson_stats()}
+        self.assertEqual(stats['Math'], (13, datetime.timedelta(minutes=90)))
+        self.assertEqual(stats['Physics'], (0, datetime.timedelta()))
+
+
+class CourseCatalogTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for i, name in enumerate(['Physics', 'Biology', 'Chemistry', 'History']):
+            course = Course.objects.create(name=name, description=name, price=100,
+                                           image=f'medias/courses/images/{name.lower()}.png', user=self.user)
+            Course.objects.filter(pk=course.pk).update(created_at=now + datetime.timedelta(minutes=i + 1))
+
+    def names(self, response):
+        return [course['name'] for course in response.json()['results']]
+
+    def test_cursor_links_walk_the_catalog_newest_first(self):
+        first = self.client.get('/api/courses/?page_size=2')
+        self.assertEqual(self.names(first), ['History', 'Chemistry'])
+        self.assertIsNone(first.json()['previous'])
+
+        second = self.client.get(first.json()['next'])
+        self.assertEqual(self.names(second), ['Biology', 'Physics'])
+        third = self.client.get(second.json()['next'])
+        self.assertEqual(self.names(third), ['Math'])
+        self.assertIsNone(third.json()['next'])
+
+        self.assertEqual(self.names(self.client.get(second.json()['previous'])), ['History', 'Chemistry'])
+
+    def test_fields_select_the_catalog_columns(self):
+        response = self.client.get('/api/courses/?fields=id, name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({tuple(sorted(course)) for course in response.json()['results']}, {('id', 'name')})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/courses/?fields=name,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: password']})
+
+
+class LessonStatsTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_course = Course.objects.create(name='Physics', description='Mechanics', price=100,
+                                                  image='medias/courses/images/physics.png', user=self.user)
+        self.other_theme = CourseTheme.objects.create(title='Motion', course=self.other_course)
+
+    def assertStats(self, obj, lesson_count, minutes):
+        obj.refresh_from_db()
+        self.assertEqual((obj.lesson_count, obj.total_duration), (lesson_count, datetime.timedelta(minutes=minutes)))
+
+    def add_lesson(self, minutes, theme=None, lesson_number=2):
+        return Lesson.objects.create(title='Lesson', lesson_number=lesson_number, video_link='https://youtu.be/def',
+                                     duration=datetime.timedelta(minutes=minutes),
+                                     course_theme=theme or self.theme)
+
+    def test_created_lessons_are_counted(self):
+        self.add_lesson(15)
+        self.assertStats(self.theme, 2, 45)
+        self.assertStats(self.course, 2, 45)
+
+    def test_duration_changes_shift_the_totals(self):
+        self.lesson.duration = datetime.timedelta(minutes=45)
+        self.lesson.save()
+        self.assertStats(self.theme, 1, 45)
+        self.assertStats(self.course, 1, 45)
+
+    def test_deleted_lessons_are_subtracted(self):
+        self.lesson.delete()
+        self.assertStats(self.theme, 0, 0)
+        self.assertStats(self.course, 0, 0)
+
+    def test_lessons_moved_between_themes_move_their_stats(self):
+        self.lesson.course_theme = self.other_theme
+        self.lesson.duration = datetime.timedelta(minutes=20)
+        self.lesson.save()
+        self.assertStats(self.theme, 0, 0)
+        self.assertStats(self.course, 0, 0)
+        self.assertStats(self.other_theme, 1, 20)
+        self.assertStats(self.other_course, 1, 20)
+
+    def test_themes_moved_between_courses_move_their_stats(self):
+        self.add_lesson(15)
+        self.theme.course = self.other_course
+        self.theme.save()
+        self.assertStats(self.course, 0, 0)
+        self.assertStats(self.other_course, 2, 45)
+        self.assertStats(self.theme, 2, 45)
+
+    def test_deleted_themes_take_their_lessons_off_the_course(self):
+        self.add_lesson(15, theme=self.other_theme)
+        CourseTheme.objects.create(title='Inequalities', course=self.course)
+        self.theme.delete()
+        self.assertStats(self.course, 0, 0)
+        self.assertStats(self.other_course, 1, 15)
+
+    def test_saving_a_stale_instance_keeps_the_stored_stats(self):
+        stale_course, stale_theme = Course.objects.get(pk=self.course.pk), CourseTheme.objects.get(pk=self.theme.pk)
+        self.add_lesson(15)
+        stale_course.name = 'Algebra'
+        stale_course.save()
+        stale_theme.title = 'Linear equations'
+        stale_theme.save()
+        self.assertStats(self.course, 2, 45)
+        self.assertStats(self.theme, 2, 45)
+        self.assertEqual(self.course.name, 'Algebra')
+
+    def test_rebuild_reports_and_fixes_drift(self):
+        Course.objects.filter(pk=self.course.pk).update(lesson_count=7, total_duration=datetime.timedelta())
+        CourseTheme.objects.filter(pk=self.theme.pk).update(lesson_count=0)
+
+        out = io.StringIO()
+        call_command('rebuild_course_stats', dry_run=True, stdout=out)
+        self.assertIn('Course "Math": 7 lessons / 0:00:00 stored, 1 lessons / 0:30:00 actual', out.getvalue())
+        self.assertIn('Theme "Equations": 0 lessons', out.getvalue())
+        self.assertIn('1 courses and 1 themes drifted', out.getvalue())
+        self.assertStats(self.course, 7, 0)
+
+        out = io.StringIO()
+        call_command('rebuild_course_stats', stdout=out)
+        self.assertIn('fixed 1 courses and 1 themes', out.getvalue())
+        self.assertStats(self.course, 1, 30)
+        self.assertStats(self.theme, 1, 30)
+        self.assertStats(self.other_course, 0, 0)
+
+
+class LessonEntitlementTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = User.objects.create_user(email='student@natije.kz', password='secret',
+                                                first_name='Test', last_name='Student', role=self.user.role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/Math/themes/Equations/lessons/{self.lesson.id}/'
+
+    def test_prime_lessons_require_a_purchase(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        BoughtCourse.objects.create(user=self.student, course=self.course)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.course.bought_users.remove(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_entitlements_are_cached(self):
+        self.course.bought_users.add(self.student)
+        self.assertTrue(owns_course(self.student, self.course.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(owns_course(self.student, self.course.id))
+            self.assertFalse(owns_course(self.student, self.course.id + 1))
+
+    def test_process_local_caches_keep_entitlements_briefly(self):
+        cache = caches[settings.ENTITLEMENTS['CACHE_ALIAS']]
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            owns_course(self.student, self.course.id)
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], settings.ENTITLEMENTS['LOCAL_TIMEOUT'])
+
+
+class FakeDurationResolver:
+    calls = []
+
+    def __call__(self, video_link):
+        self.calls.append(video_link)
+        if 'missing' in video_link:
+            raise ValueError('Video unavailable')
+        if 'flaky' in video_link and self.calls.count(video_link) == 1:
+            raise ConnectionError('Connection reset')
+        return datetime.timedelta(minutes=10)
+
+
+FAKE_LESSON_DURATIONS = {
+    'RESOLVER': 'api.courses.tests.FakeDurationResolver',
+    'CACHE_ALIAS': 'default',
+    'CACHE_TTL': 60,
+    'MAX_WORKERS': 2,
+}
+
+
+@override_settings(LESSON_DURATIONS=FAKE_LESSON_DURATIONS)
+class LessonDurationTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        FakeDurationResolver.calls = []
+
+    def create_lesson(self, video_link, lesson_number):
+        serializer = LessonSerializer(data={'title': 'Lesson', 'video_link': video_link,
+                                            'lesson_number': lesson_number})
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = serializer.save(course_theme=self.theme)
+        self.assertEqual(serializer.data['duration_status'], Lesson.DurationStatus.PENDING)
+        lesson.refresh_from_db()
+        return lesson
+
+    def test_lesson_is_saved_pending_and_resolved_later(self):
+        lesson = self.create_lesson('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 2)
+        self.assertEqual(lesson.duration_status, Lesson.DurationStatus.RESOLVED)
+        self.assertEqual(lesson.duration, datetime.timedelta(minutes=10))
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.total_duration, datetime.timedelta(minutes=40))
+
+    def test_durations_are_memoized_per_video_id(self):
+        self.create_lesson('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 2)
+        self.create_lesson('https://youtu.be/dQw4w9WgXcQ', 3)
+        self.assertEqual(len(FakeDurationResolver.calls), 1)
+
+    def test_failed_resolution_is_recorded(self):
+        lesson = self.create_lesson('https://youtu.be/missing0000', 2)
+        self.assertEqual(lesson.duration_status, Lesson.DurationStatus.FAILED)
+        self.assertEqual(len(FakeDurationResolver.calls), resolve_lesson_duration_task.max_retries + 1)
+
+    def test_transient_errors_are_retried(self):
+        lesson = self.create_lesson('https://youtu.be/flaky000000', 2)
+        self.assertEqual(lesson.duration_status, Lesson.DurationStatus.RESOLVED)
+        self.assertEqual(len(FakeDurationResolver.calls), 2)
+
+    def test_rejected_update_does_not_resolve(self):
+        Lesson.objects.create(title='Taken', lesson_number=2, video_link='https://youtu.be/abc',
+                              course_theme=self.theme)
+        serializer = LessonSerializer(self.lesson, data={'video_link': 'https://youtu.be/dQw4w9WgXcQ',
+                                                         'lesson_number': 2}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(FakeDurationResolver.calls, [])
+
+    def test_unchanged_link_is_not_refetched(self):
+        serializer = LessonSerializer(self.lesson, data={'title': 'Renamed', 'video_link': self.lesson.video_link},
+                                      partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        self.assertEqual(FakeDurationResolver.calls, [])
+
+    def test_course_batch_resolution(self):
+        Lesson.objects.create(title='Broken', lesson_number=2, video_link='https://youtu.be/missing0000',
+                              course_theme=self.theme)
+        self.assertEqual(resolve_course_durations(self.course), 1)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.duration, datetime.timedelta(minutes=10))
+        self.assertEqual(len(FakeDurationResolver.calls), 2)
+
+
+@override_settings(LESSON_DURATIONS=FAKE_LESSON_DURATIONS)
+class LessonLinkChangeTests(CourseFixtureMixin, TransactionTestCase):
+    """
+    Runs in autocommit like a request, where on_commit callbacks fire right away.
+    """
+
+    def setUp(self):
+        super().setUp()
+        FakeDurationResolver.calls = []
+
+    def test_changed_link_is_resolved_after_save(self):
+        serializer = LessonSerializer(self.lesson, data={'video_link': 'https://youtu.be/dQw4w9WgXcQ'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.lesson.refresh_from_db()
+        self.assertEqual(FakeDurationResolver.calls, ['https://youtu.be/dQw4w9WgXcQ'])
+        self.assertEqual(self.lesson.duration_status, Lesson.DurationStatus.RESOLVED)
+        self.assertEqual(self.lesson.duration, datetime.timedelta(minutes=10))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite.')
+class CourseQueryPlanTests(CourseFixtureMixin, TestCase):
+    def assertSearchesBy(self, queryset, *columns):
+        plan = queryset.explain()
+        condition = re.escape(' AND '.join(f'{column}=?' for column in columns))
+        self.assertRegex(plan, rf'SEARCH {queryset.model._meta.db_table} USING (COVERING )?INDEX \S+ \({condition}\)')
+
+    def test_purchase_lookup_uses_composite_index(self):
+        self.assertSearchesBy(BoughtCourse.objects.filter(user=self.user, course=self.course), 'user_id', 'course_id')
+
+    def test_theme_lessons_are_read_in_index_order(self):
+        queryset = Lesson.objects.filter(course_theme=self.theme).order_by('lesson_number')
+        self.assertSearchesBy(queryset, 'course_theme_id')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_catalog_pages_are_read_in_index_order(self):
+        queryset = Course.objects.order_by('-created_at', '-id')[:21]
+        plan = queryset.explain()
+        self.assertIn('USING INDEX course_created_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_lesson_numbers_are_unique_per_theme(self):
+        other_theme = CourseTheme.objects.create(title='Geometry', course=self.course)
+        serializer = LessonSerializer(data={'title': 'Angles', 'video_link': 'https://youtu.be/def',
+                                            'lesson_number': self.lesson.lesson_number})
+        serializer.is_valid(raise_exception=True)
+        with override_settings(LESSON_DURATIONS=FAKE_LESSON_DURATIONS):
+            self.assertEqual(serializer.save(course_theme=other_theme).lesson_number, self.lesson.lesson_number)
+
+
+class AccessCodeTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = User.objects.create_user(email='student@natije.kz', password='secret',
+                                                first_name='Test', last_name='Student', role=self.user.role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_codes_are_stored_hashed(self):
+        codes = issue_codes(50, AccessCode.Kind.COURSE, course=self.course)
+        self.assertEqual(len(set(codes)), 50)
+        self.assertRegex(codes[0], r'^[A-Z0-9]{4}-[A-Z0-9]{4}-[A-Z0-9]{4}$')
+        stored = set(AccessCode.objects.values_list('code_hash', flat=True))
+        self.assertEqual(stored, {hash_code(code) for code in codes})
+        self.assertNotIn(codes[0].replace('-', ''), ''.join(stored))
+
+    def test_course_code_is_spent_once(self):
+        code, = issue_codes(1, AccessCode.Kind.COURSE, course=self.course)
+        self.assertFalse(owns_course(self.student, self.course.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            redeem_code(self.student.id, code.lower().replace('-', ''))
+        self.assertTrue(owns_course(self.student, self.course.id))
+
+        other = User.objects.create_user(email='other@natije.kz', password='secret',
+                                         first_name='Other', last_name='Student', role=self.user.role)
+        with self.assertRaises(AccessCodeError):
+            redeem_code(other.id, code)
+        self.assertFalse(BoughtCourse.objects.filter(user=other).exists())
+
+    def test_code_for_an_owned_course_stays_unused(self):
+        BoughtCourse.objects.create(user=self.student, course=self.course)
+        code, = issue_codes(1, AccessCode.Kind.COURSE, course=self.course)
+        with self.assertRaises(AccessCodeError):
+            redeem_code(self.student.id, code)
+        self.assertIsNone(AccessCode.objects.get().redeemed_at)
+
+    def test_test_code_extends_the_limit(self):
+        self.student.profile.test_limit = timezone.now() - datetime.timedelta(days=3)
+        self.student.profile.save()
+        self.assertFalse(has_test_access(self.student))
+        first, second = issue_codes(2, AccessCode.Kind.TEST, days=7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            redeem_code(self.student.id, first)
+        self.assertTrue(has_test_access(self.student))
+        redeem_code(self.student.id, second)
+
+        self.student.profile.refresh_from_db()
+        expected = timezone.now() + datetime.timedelta(days=14)
+        self.assertAlmostEqual(self.student.profile.test_limit, expected, delta=datetime.timedelta(minutes=1))
+
+    def test_redeem_endpoint(self):
+        code, = issue_codes(1, AccessCode.Kind.COURSE, course=self.course)
+        response = self.client.post('/api/courses/redeem/', {'code': code})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'kind': 'course', 'course': self.course.id, 'days': None})
+
+        response = self.client.post('/api/courses/redeem/', {'code': code})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('code', response.json())
@@ -4,6 +4,9 @@ from api.courses import views
 
 urlpatterns = [
     path('', views.CourseListCreateView.as_view()),
+    path('async/', views.AsyncCourseListView.as_view()),
+    path('redeem/', views.RedeemAccessCodeView.as_view()),
+    path('async/<str:course_name>/themes/', views.AsyncSyllabusView.as_view()),
     path('<str:course_name>/themes/', views.CourseAndThemeView.as_view()),
     path('<str:course_name>/themes/<str:theme_name>/', views.ThemeAndLessonView.as_view()),
     path('<str:course_name>/themes/<str:theme_name>/lessons/<int:lesson_id>/',
@@ -0,0 +1,11 @@
+import datetime
+
+
+def format_duration(duration):
+    """Render a timedelta as HH:MM."""
+    if duration is None:
+        duration = datetime.timedelta()
+    total_seconds = int(duration.total_seconds())
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return "{:02}:{:02}".format(hours, minutes)
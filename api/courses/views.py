@@ -1,17 +1,77 @@
-import datetime
+from urllib.parse import urlencode
 
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from rest_framework import generics, status, mixins
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from api.cache import acached_response, cached_response
+from api.courses.access_codes import AccessCodeError, redeem_code
+from api.courses.cache import course_cache, course_namespace, CATALOG_NAMESPACE
 from api.courses.models import Course, CourseTheme, Lesson, LessonMaterial
-from api.courses.serializers import CourseSerializer, CourseThemeSerializer, LessonSerializer, LessonMaterialSerializer
+from api.courses.serializers import (CourseSerializer,
+                                     CourseListSerializer,
+                                     CourseThemeSerializer,
+                                     LessonSerializer,
+                                     LessonMaterialSerializer,
+                                     RedeemAccessCodeSerializer)
 from api.users.permissions import IsTeacherUser, IsOwnerUser
+from api.courses.pagination import CourseCursorPagination
 from api.courses.permissions import IsBoughtOrFree
+from api.courses.syllabus import get_syllabus_queryset, build_syllabus
 
 
-class CourseListCreateView(generics.ListCreateAPIView):
+class CourseCatalogMixin:
+    pagination_class = CourseCursorPagination
+
+    def get_list_fields(self):
+        """
+        Return the catalog fields requested with ?fields=, all of them by default.
+        """
+        allowed_fields = CourseListSerializer.Meta.fields
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return allowed_fields
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown_fields = [field for field in fields if field not in allowed_fields]
+        if unknown_fields:
+            raise ValidationError({'fields': [f'Unknown field: {field}' for field in unknown_fields]})
+        return fields
+
+    def get_catalog_url(self):
+        """
+        The catalog URL with only the query parameters that shape the page,
+        normalized, so equivalent requests share one cache entry.
+        """
+        paginator = self.pagination_class()
+        query_params = self.request.query_params
+        params = {}
+        if query_params.get(paginator.cursor_query_param):
+            params[paginator.cursor_query_param] = query_params[paginator.cursor_query_param]
+        if query_params.get(paginator.page_size_query_param):
+            params[paginator.page_size_query_param] = paginator.get_page_size(self.request)
+        if query_params.get('fields'):
+            params['fields'] = ','.join(self.get_list_fields())
+        url = self.request.build_absolute_uri(self.request.path)
+        return f'{url}?{urlencode(params)}' if params else url
+
+    def get_catalog_page(self):
+        fields = self.get_list_fields()
+        queryset = Course.objects.only('id', 'created_at', *fields)
+        # A paginator of its own so async views, which are not GenericAPIViews, can use it too.
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        # The page is cached for every request with the same catalog URL, its links must not carry the others.
+        paginator.base_url = self.get_catalog_url()
+        serializer = CourseListSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data).data
+
+
+class CourseListCreateView(CourseCatalogMixin, generics.ListCreateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
 
@@ -23,16 +83,23 @@ class CourseListCreateView(generics.ListCreateAPIView):
         return super().get_permissions()
 
     def list(self, request, *args, **kwargs):
-        queryset = Course.objects.all()
-        serializer = CourseSerializer(queryset, many=True)
-        response_data = []
-        for obj in serializer.data:
-            response_data.append({"id": obj["id"],
-                                  "image": obj["image"],
-                                  "name": obj["name"],
-                                  "price": obj["price"]
-                                  })
-        return Response(response_data)
+        return cached_response(request, course_cache, CATALOG_NAMESPACE,
+                               self.get_catalog_url(), self.get_catalog_page)
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
+
+
+class AsyncCourseListView(CourseCatalogMixin, AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request, *args, **kwargs):
+        async def build_data():
+            # DRF's cursor pagination evaluates the page synchronously.
+            return await sync_to_async(self.get_catalog_page)()
+
+        return await acached_response(request, course_cache, CATALOG_NAMESPACE,
+                                      self.get_catalog_url(), build_data)
 
 
 class CourseAndThemeView(
@@ -88,54 +155,38 @@ class CourseAndThemeView(
         return Response(theme_serializer.data, status=status.HTTP_201_CREATED)
 
     def get(self, request, *args, **kwargs):
-        course = self.get_course_object()
-        course_serializer = CourseSerializer(course).data
-        course_themes = CourseTheme.objects.filter(course=course)
-        course_theme_data = []
-
-        for course_theme in course_themes:
-            temp_response_lesson = []
-            lessons = Lesson.objects.filter(course_theme=course_theme).order_by("lesson_number").all()
-            temp_duration_of_theme = datetime.timedelta()
-
-            for idx, lesson in enumerate(lessons, start=1):
-                total_seconds = int(lesson.duration.total_seconds())
-                hours, remainder = divmod(total_seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                duration_str = "{:02}:{:02}".format(hours, minutes)
-                temp_lesson_dict = {
-                    "id": lesson.id,
-                    "title": lesson.title,
-                    "link": lesson.video_link,
-                    "lesson_number": idx,
-                    "duration": duration_str,
-                    "is_prime": lesson.is_prime
-                }
-                temp_duration_of_theme += lesson.duration
-                temp_response_lesson.append(temp_lesson_dict)
-
-            total_seconds = int(temp_duration_of_theme.total_seconds())
-            hours, remainder = divmod(total_seconds, 3600)
-            minutes, _ = divmod(remainder, 60)
-            duration_str = "{:02}:{:02}".format(hours, minutes)
-
-            temp_theme_dict = {
-                "title": course_theme.title,
-                "count_lessons": lessons.count(),
-                "duration": duration_str,
-                'lessons': temp_response_lesson
-            }
-            course_theme_data.append(temp_theme_dict)
-
-        course_serializer['course_themes'] = course_theme_data
-
-        return Response(course_serializer)
+        course_name = self.kwargs.get('course_name')
+        course_id = get_object_or_404(Course.objects.values_list('id', flat=True), name=course_name)
+
+        def build_data():
+            course = get_object_or_404(get_syllabus_queryset(), pk=course_id)
+            return build_syllabus(course)
+
+        return cached_response(request, course_cache, course_namespace(course_id), 'syllabus', build_data)
 
     def perform_create(self, serializer):
         course = self.get_course_object()
         serializer.save(course=course)
 
 
+class AsyncSyllabusView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request, *args, **kwargs):
+        course_id = await Course.objects.filter(name=kwargs['course_name']).values_list('id', flat=True).afirst()
+        if course_id is None:
+            raise Http404
+
+        async def build_data():
+            try:
+                course = await get_syllabus_queryset().aget(pk=course_id)
+            except Course.DoesNotExist:
+                raise Http404
+            return build_syllabus(course)
+
+        return await acached_response(request, course_cache, course_namespace(course_id), 'syllabus', build_data)
+
+
 class ThemeAndLessonView(generics.GenericAPIView,
                          mixins.CreateModelMixin,
                          mixins.UpdateModelMixin,
@@ -224,7 +275,8 @@ class RetrieveUpdateDeleteLessonView(generics.RetrieveUpdateDestroyAPIView, mixi
 
     def get_object(self):
         theme = self.get_course_theme()
-        lesson = get_object_or_404(Lesson, pk=self.kwargs['lesson_id'], course=theme)
+        lesson = get_object_or_404(Lesson, pk=self.kwargs['lesson_id'], course_theme=theme)
+        lesson.course_theme = theme
         return lesson
 
     def get(self, request, *args, **kwargs):
@@ -256,3 +308,18 @@ class LessonMaterialsRUDView(generics.RetrieveUpdateDestroyAPIView):
     http_method_names = ['patch', 'delete']
     permission_classes = [IsAuthenticated, IsOwnerUser]
     lookup_url_kwarg = 'material_id'
+
+
+class RedeemAccessCodeView(generics.GenericAPIView):
+    serializer_class = RedeemAccessCodeSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            access_code = redeem_code(request.user.id, serializer.validated_data['code'])
+        except AccessCodeError as e:
+            raise ValidationError({'code': [str(e)]})
+        return Response({'kind': access_code.kind, 'course': access_code.course_id, 'days': access_code.days},
+                        status=status.HTTP_200_OK)
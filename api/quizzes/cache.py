@@ -0,0 +1,12 @@
+from api.cache import VersionedCache
+
+quiz_cache = VersionedCache('quizzes')
+
+
+def quiz_namespace(quiz_id):
+    return f'quiz-{quiz_id}'
+
+
+def bump_quiz_version(quiz_id):
+    if quiz_id is not None:
+        quiz_cache.bump(quiz_namespace(quiz_id))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.quizzes.models import UserResults, UserQuizStats
+from api.quizzes.stats import add_result
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user quiz statistics from the stored results'
+
+    def handle(self, *args, **options):
+        stats_by_key = {}
+        results = UserResults.objects.order_by('date_added', 'id').values_list('user_id', 'quiz_id', 'score',
+                                                                                'date_added')
+        for user_id, quiz_id, score, date_added in results.iterator():
+            stats = stats_by_key.get((user_id, quiz_id))
+            if stats is None:
+                stats = stats_by_key[(user_id, quiz_id)] = UserQuizStats(user_id=user_id, quiz_id=quiz_id)
+            add_result(stats, score, date_added)
+
+        with transaction.atomic():
+            UserQuizStats.objects.all().delete()
+            UserQuizStats.objects.bulk_create(stats_by_key.values(), batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(stats_by_key)} quiz stats rows'))
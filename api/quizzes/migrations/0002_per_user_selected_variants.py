@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='variant',
+            name='is_selected',
+        ),
+        migrations.AddField(
+            model_name='userresults',
+            name='selected_variants',
+            field=models.JSONField(default=list),
+        ),
+    ]
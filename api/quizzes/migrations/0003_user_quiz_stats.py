@@ -0,0 +1,55 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.quizzes.stats import add_result
+
+
+def fill_quiz_stats(apps, schema_editor):
+    UserResults = apps.get_model('quizzes', 'UserResults')
+    UserQuizStats = apps.get_model('quizzes', 'UserQuizStats')
+    stats_by_key = {}
+    results = UserResults.objects.order_by('date_added', 'id').values_list('user_id', 'quiz_id', 'score',
+                                                                            'date_added')
+    for user_id, quiz_id, score, date_added in results.iterator():
+        stats = stats_by_key.get((user_id, quiz_id))
+        if stats is None:
+            stats = stats_by_key[(user_id, quiz_id)] = UserQuizStats(user_id=user_id, quiz_id=quiz_id)
+        add_result(stats, score, date_added)
+    UserQuizStats.objects.bulk_create(stats_by_key.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_per_user_selected_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(null=True)),
+                ('worst_score', models.IntegerField(null=True)),
+                ('last_score', models.IntegerField(null=True)),
+                ('last_attempt_at', models.DateTimeField(null=True)),
+                ('week_start', models.DateField(null=True)),
+                ('week_attempt_count', models.IntegerField(default=0)),
+                ('week_best', models.JSONField(null=True)),
+                ('week_worst', models.JSONField(null=True)),
+                ('week_results', models.JSONField(default=list)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quizzes.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userquizstats',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz'), name='unique_user_quiz_stats'),
+        ),
+        migrations.RunPython(fill_quiz_stats, migrations.RunPython.noop),
+    ]
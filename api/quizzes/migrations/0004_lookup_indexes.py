@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    UserAnswer = apps.get_model('quizzes', 'UserAnswer')
+    keep = (UserAnswer.objects.values('user', 'quiz', 'question', 'selected_choice')
+            .annotate(keep_id=Min('id')).values_list('keep_id', flat=True))
+    UserAnswer.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_user_quiz_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userresults',
+            index=models.Index(fields=['user', 'quiz', 'date_added'], name='userresults_user_quiz_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='useranswer',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz', 'question', 'selected_choice'), name='unique_user_answer'),
+        ),
+    ]
@@ -28,7 +28,6 @@ class Variant(models.Model):
     title = models.CharField(max_length=155)
     is_correct = models.BooleanField(default=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
-    is_selected = models.BooleanField(default=False)
 
     def __str__(self):
         return self.title
@@ -40,6 +39,11 @@ class UserAnswer(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_choice = models.ForeignKey(Variant, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz', 'question', 'selected_choice'], name='unique_user_answer'),
+        ]
+
     def __str__(self):
         return f"{self.quiz} choice {self.selected_choice} with user {self.user}"
 
@@ -49,3 +53,40 @@ class UserResults(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     score = models.IntegerField()
     date_added = models.DateTimeField(auto_now_add=True)
+    # Variant ids the user selected in this attempt, used to render its review.
+    selected_variants = models.JSONField(default=list)
+    # Set by queued submissions, so a redelivered scoring task stores its attempt once.
+    attempt_key = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'quiz', 'date_added'], name='userresults_user_quiz_date_idx'),
+        ]
+
+
+class UserQuizStats(models.Model):
+    """
+    Per-user, per-quiz aggregates of UserResults, updated by api.quizzes.signals
+    whenever a result is written.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    attempt_count = models.IntegerField(default=0)
+    best_score = models.IntegerField(null=True)
+    worst_score = models.IntegerField(null=True)
+    last_score = models.IntegerField(null=True)
+    last_attempt_at = models.DateTimeField(null=True)
+    # Window of the week starting on week_start (a Monday), results as {"score", "date"}.
+    week_start = models.DateField(null=True)
+    week_attempt_count = models.IntegerField(default=0)
+    week_best = models.JSONField(null=True)
+    week_worst = models.JSONField(null=True)
+    week_results = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz'], name='unique_user_quiz_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} stats on {self.quiz}"
@@ -0,0 +1,27 @@
+from django.db.models import Prefetch
+
+from api.quizzes.models import Quiz, Question, Variant
+from api.quizzes.serializers import QuizPayloadSerializer
+
+
+def get_payload_queryset():
+    """
+    Quiz queryset with questions and their variants prefetched,
+    so a whole quiz costs three queries regardless of its size.
+    """
+    variants = Variant.objects.order_by('id')
+    questions = Question.objects.order_by('id').prefetch_related(Prefetch('variant_set', queryset=variants))
+    return Quiz.objects.prefetch_related(Prefetch('question_set', queryset=questions))
+
+
+def build_quiz_payload(quiz, include_answers=False):
+    """
+    Serialize a quiz fetched with get_payload_queryset(). Correct-answer flags
+    are only kept when include_answers is set.
+    """
+    data = QuizPayloadSerializer(quiz).data
+    if not include_answers:
+        for question in data['questions']:
+            for variant in question['variants']:
+                variant.pop('is_correct')
+    return data
@@ -1,7 +1,6 @@
-from datetime import datetime
+from rest_framework import permissions
 
-from rest_framework import permissions, exceptions
-from social_core.pipeline import user
+from api.courses.entitlements import has_test_access
 
 
 class IsSuperUserOrReadOnly(permissions.BasePermission):
@@ -14,29 +13,15 @@ class IsSuperUserOrReadOnly(permissions.BasePermission):
         if request.user.is_superuser:
             return True
         if request.method in permissions.SAFE_METHODS:
-            if obj.is_trial:
-                return True
-            else:
-                user_profile = getattr(request.user, 'profile', None)
-                if user_profile and user_profile.test_limit.timestamp() - datetime.now().timestamp() > 0:
-                    return True
-                else:
-                    return False
+            return obj.is_trial or has_test_access(request.user)
 
 
 class IsBoughtUser(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser:
-            return True
-        if request.method in permissions.SAFE_METHODS:
-            if obj.is_trial:
-                return True
-            else:
-                user_profile = getattr(request.user, 'profile', None)
-                if user_profile and user_profile.test_limit.timestamp() - datetime.now().timestamp() > 0:
-                    return True
-                else:
-                    return False
+        return obj.is_trial or has_test_access(request.user)
 
 
 class IsSuperUser(permissions.BasePermission):
@@ -0,0 +1,64 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from api.quizzes.models import Variant, UserAnswer, UserResults
+
+
+def load_selected_variants(user, quiz):
+    """
+    Map question id -> set of variant ids the user selected, in one query.
+    """
+    selected = defaultdict(set)
+    answers = UserAnswer.objects.filter(user_id=user.id, quiz=quiz).values_list('selected_choice__question_id',
+                                                                          'selected_choice_id')
+    for question_id, variant_id in answers:
+        selected[question_id].add(variant_id)
+    return selected
+
+
+def load_correct_variants(quiz):
+    """
+    Map question id -> set of correct variant ids of the quiz, in one query.
+    """
+    correct = defaultdict(set)
+    variants = Variant.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')
+    for question_id, variant_id in variants:
+        correct[question_id].add(variant_id)
+    return correct
+
+
+def score_answers(selected, correct):
+    """
+    A question scores a point when exactly its correct variants were selected,
+    which covers both single and multiple answer questions.
+    """
+    return sum(1 for question_id, variant_ids in selected.items()
+               if variant_ids and variant_ids == correct.get(question_id))
+
+
+def submit_quiz(user, quiz, selected=None, attempt_key=None):
+    """
+    Score the user's answers and store them as a new attempt. `selected` maps
+    question id -> selected variant ids, by default the pending UserAnswer
+    rows are used and then cleared. With an `attempt_key` the attempt is
+    stored once, running again returns the stored result. Only rows owned by
+    the user are written, so concurrent submissions never contend on shared
+    quiz or variant rows.
+    """
+    with transaction.atomic():
+        pending = selected is None
+        if pending:
+            selected = load_selected_variants(user, quiz)
+        score = score_answers(selected, load_correct_variants(quiz))
+        selected_variants = sorted(set().union(*selected.values()))
+
+        values = {'user_id': user.id, 'quiz': quiz, 'score': score, 'selected_variants': selected_variants}
+        if attempt_key is None:
+            result = UserResults.objects.create(**values)
+        else:
+            result, _ = UserResults.objects.get_or_create(attempt_key=attempt_key, defaults=values)
+        if pending:
+            # Only the rows scored here, answers saved meanwhile belong to the next attempt.
+            UserAnswer.objects.filter(user_id=user.id, quiz=quiz, selected_choice_id__in=selected_variants).delete()
+    return result
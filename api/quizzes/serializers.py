@@ -1,5 +1,3 @@
-from datetime import datetime
-
 from .models import Quiz, Question, Variant, UserAnswer, UserResults
 from rest_framework import serializers
 
@@ -8,6 +6,7 @@ class QuizSerializer(serializers.ModelSerializer):
     question_count = serializers.SerializerMethodField()
     request_user_has_access = serializers.SerializerMethodField()
     max_score = serializers.SerializerMethodField()
+    last_result = serializers.SerializerMethodField()
 
     class Meta:
         model = Quiz
@@ -18,27 +17,28 @@ class QuizSerializer(serializers.ModelSerializer):
     def get_request_user_has_access(self, obj):
         if obj.is_trial:
             return True
-        user_profile = obj.user.profile.test_limit
-        if user_profile.test_limit.timestamp() - datetime.now().timestamp() > 0:
-            return True
-        return False
+        return self.context.get('has_test_access', False)
 
     def get_max_score(self, obj):
-        self.max_score = getattr(self, 'max_score', 0)
-        self.max_score = max(obj.last_result, self.max_score)
-        return self.max_score
+        stats = self.context.get('user_stats', {}).get(obj.id)
+        return stats.best_score if stats else 0
+
+    def get_last_result(self, obj):
+        stats = self.context.get('user_stats', {}).get(obj.id)
+        return stats.last_score if stats else 0
 
-    @staticmethod
-    def get_question_count(obj):
-        questions = Question.objects.filter(quiz=obj)
-        return questions.count()
+    def get_question_count(self, obj):
+        question_count = getattr(obj, 'question_count', None)
+        if question_count is None:
+            question_count = Question.objects.filter(quiz=obj).count()
+        return question_count
 
 
 class VariantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Variant
         fields = ['id', 'title', 'is_correct']
-        read_only_fields = ['question', 'is_selected']
+        read_only_fields = ['question']
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -50,6 +50,28 @@ class QuestionSerializer(serializers.ModelSerializer):
         read_only_fields = ['quiz']
 
 
+class QuizPayloadVariantSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Variant
+        fields = ['id', 'title', 'is_correct']
+
+
+class QuizPayloadQuestionSerializer(serializers.ModelSerializer):
+    variants = QuizPayloadVariantSerializer(source='variant_set', many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'title', 'has_multiple_correct_answers', 'variants']
+
+
+class QuizPayloadSerializer(serializers.ModelSerializer):
+    questions = QuizPayloadQuestionSerializer(source='question_set', many=True, read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'title', 'description', 'is_trial', 'questions']
+
+
 class UserAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserAnswer
@@ -57,8 +79,13 @@ class UserAnswerSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'quiz', 'question']
 
 
+class UserAnswerSheetSerializer(serializers.Serializer):
+    selected_choices = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+    submit = serializers.BooleanField(default=False)
+
+
 class UserResultsSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserResults
         fields = '__all__'
-        read_only_fields = ['score', 'quiz', 'user', 'date_added']
+        read_only_fields = ['score', 'quiz', 'user', 'date_added', 'selected_variants', 'attempt_key']
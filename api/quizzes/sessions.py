@@ -0,0 +1,156 @@
+import contextlib
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from api.cache import is_process_local
+from api.quizzes.models import UserAnswer
+from api.quizzes.tasks import score_attempt
+
+
+class QuizAttemptSession:
+    """
+    Answers a user toggles during a quiz attempt, buffered in the cache under
+    (user, quiz). They reach UserAnswer only on autosave, at most once every
+    QUIZ_SESSIONS['AUTOSAVE_INTERVAL'] seconds, and on submit.
+
+    Changes hold a lock on the attempt, so concurrent toggles from several
+    tabs or workers never overwrite each other.
+
+    A process-local cache (the LocMem default) would hide toggles from the
+    other workers and not lock across them, so then nothing is buffered:
+    toggles write their UserAnswer row right away and reads come from the
+    database.
+    """
+    # Seconds a lock lives, should its holder die before releasing it.
+    lock_timeout = 5
+
+    def __init__(self, user_id, quiz_id):
+        options = settings.QUIZ_SESSIONS
+        self.user_id = user_id
+        self.quiz_id = quiz_id
+        self.cache = caches[options['CACHE_ALIAS']]
+        self.timeout = options['TIMEOUT']
+        self.autosave_interval = options['AUTOSAVE_INTERVAL']
+        self.key = f'quizzes:attempt:{user_id}:{quiz_id}'
+        self.buffered = not is_process_local(self.cache)
+
+    def _load(self):
+        state = self.cache.get(self.key) if self.buffered else None
+        if state is None:
+            # Resume from the last autosave, e.g. after the cache entry expired.
+            answers = UserAnswer.objects.filter(user_id=self.user_id, quiz_id=self.quiz_id)
+            state = {
+                'answers': dict(answers.values_list('selected_choice_id', 'question_id')),
+                'saved_at': time.time(),
+            }
+        return state
+
+    def _store(self, state):
+        if self.buffered:
+            self.cache.set(self.key, state, timeout=self.timeout)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        lock_key = f'{self.key}:lock'
+        token = uuid.uuid4().hex
+        # add() only succeeds for one caller, the others wait for the lock to be released or expire.
+        while not self.cache.add(lock_key, token, timeout=self.lock_timeout):
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def toggle(self, question_id, variant_id):
+        """
+        Select the variant or unselect it if it was selected. Returns whether it is selected now.
+        """
+        if not self.buffered:
+            return self._toggle_saved(question_id, variant_id)
+        with self._locked():
+            state = self._load()
+            selected = state['answers'].pop(variant_id, None) is None
+            if selected:
+                state['answers'][variant_id] = question_id
+            if time.time() - state['saved_at'] >= self.autosave_interval:
+                self._save(state)
+            self._store(state)
+        return selected
+
+    def _toggle_saved(self, question_id, variant_id):
+        # Only the variant's own row is touched, concurrent toggles of other variants cannot undo it.
+        answer = {'user_id': self.user_id, 'quiz_id': self.quiz_id, 'selected_choice_id': variant_id}
+        deleted, _ = UserAnswer.objects.filter(**answer).delete()
+        if deleted:
+            return False
+        UserAnswer.objects.get_or_create(**answer, defaults={'question_id': question_id})
+        return True
+
+    def selected(self):
+        """
+        Map question id -> set of selected variant ids.
+        """
+        selected = defaultdict(set)
+        for variant_id, question_id in self._load()['answers'].items():
+            selected[question_id].add(variant_id)
+        return selected
+
+    def _save(self, state):
+        with transaction.atomic():
+            UserAnswer.objects.filter(user_id=self.user_id, quiz_id=self.quiz_id).delete()
+            UserAnswer.objects.bulk_create(
+                UserAnswer(user_id=self.user_id, quiz_id=self.quiz_id, question_id=question_id,
+                           selected_choice_id=variant_id)
+                for variant_id, question_id in state['answers'].items()
+            )
+        state['saved_at'] = time.time()
+
+    def save(self):
+        """
+        Write the buffered answers to UserAnswer.
+        """
+        if not self.buffered:
+            return
+        with self._locked():
+            state = self._load()
+            self._save(state)
+            self._store(state)
+
+    def replace(self, answers, save=True):
+        """
+        Replace the whole selection with `answers` (variant id -> question id).
+        """
+        state = {'answers': dict(answers), 'saved_at': time.time()}
+        with self._locked():
+            if save or not self.buffered:
+                self._save(state)
+            self._store(state)
+
+    def discard(self):
+        self.cache.delete(self.key)
+
+
+def enqueue_submission(user, quiz):
+    """
+    Close the user's attempt and hand its answers to the scoring queue.
+    Returns the attempt key its UserResults row will be stored under.
+    """
+    session = QuizAttemptSession(user.id, quiz.id)
+    attempt_key = str(uuid.uuid4())
+    # Locked so a toggle landing meanwhile either makes it into the attempt or starts the next one.
+    with session._locked():
+        selected = session.selected()
+        # The task gets the answers themselves, clear the autosaved ones, deselected ones included,
+        # now rather than when it runs, by which time the user may have saved answers of a new attempt.
+        UserAnswer.objects.filter(user_id=user.id, quiz_id=quiz.id).delete()
+        score_attempt.delay(user.id, quiz.id,
+                            [[question_id, sorted(variant_ids)] for question_id, variant_ids in selected.items()],
+                            attempt_key)
+        session.discard()
+    return attempt_key
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.quizzes.cache import bump_quiz_version
+from api.quizzes.models import Quiz, Question, Variant, UserResults
+from api.quizzes.stats import record_result
+
+
+@receiver(post_save, sender=UserResults)
+def update_stats_on_result(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_result(instance)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def bump_quiz_cache_on_quiz_change(sender, instance, **kwargs):
+    bump_quiz_version(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_quiz_cache_on_question_change(sender, instance, **kwargs):
+    bump_quiz_version(instance.quiz_id)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def bump_quiz_cache_on_variant_change(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    bump_quiz_version(quiz_id)
@@ -0,0 +1,66 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from api.quizzes.models import UserQuizStats
+
+RECENT_RESULTS_LIMIT = 10
+
+
+def get_week_start(moment=None):
+    today = timezone.localdate(moment)
+    return today - datetime.timedelta(days=today.weekday())
+
+
+def add_result(stats, score, date_added):
+    """
+    Fold one result into the stats row, in memory.
+    """
+    stats.attempt_count += 1
+    stats.best_score = score if stats.best_score is None else max(stats.best_score, score)
+    stats.worst_score = score if stats.worst_score is None else min(stats.worst_score, score)
+    if stats.last_attempt_at is None or date_added >= stats.last_attempt_at:
+        stats.last_score = score
+        stats.last_attempt_at = date_added
+
+    week_start = get_week_start(date_added)
+    if stats.week_start != week_start:
+        if stats.week_start and week_start < stats.week_start:
+            return
+        stats.week_start = week_start
+        stats.week_attempt_count = 0
+        stats.week_best = stats.week_worst = None
+        stats.week_results = []
+
+    result = {"score": score, "date": serializers.DateTimeField().to_representation(date_added)}
+    stats.week_attempt_count += 1
+    # Ties go to the newest result.
+    if stats.week_best is None or score >= stats.week_best['score']:
+        stats.week_best = result
+    if stats.week_worst is None or score <= stats.week_worst['score']:
+        stats.week_worst = result
+    stats.week_results = [result, *stats.week_results][:RECENT_RESULTS_LIMIT]
+
+
+def record_result(user_results):
+    with transaction.atomic():
+        # A missing row cannot be locked: the first results of a user racing to insert it settle on
+        # the unique constraint, the loser reads and locks the winner's row.
+        stats, _ = UserQuizStats.objects.select_for_update().get_or_create(user_id=user_results.user_id,
+                                                                           quiz_id=user_results.quiz_id)
+        add_result(stats, user_results.score, user_results.date_added)
+        stats.save()
+    return stats
+
+
+def get_week_summary(stats):
+    """
+    The weekly part of the quiz page, empty when the stored window is not the current week.
+    """
+    if stats is None or stats.week_start != get_week_start():
+        return {"user_results": [], "user_max_result": None, "user_min_result": None}
+    return {"user_results": stats.week_results,
+            "user_max_result": stats.week_best,
+            "user_min_result": stats.week_worst}
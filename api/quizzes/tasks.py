@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.db import OperationalError
+
+from api.quizzes.models import Quiz
+from api.quizzes.scoring import submit_quiz
+from api.users.models import User
+
+
+@shared_task(autoretry_for=(OperationalError,), max_retries=5, retry_backoff=True)
+def score_attempt(user_id, quiz_id, selected, attempt_key):
+    """
+    Score and store a submitted attempt. `selected` holds [question id, variant ids] pairs.
+    The attempt is stored once per `attempt_key`, so a redelivered task does not add it again.
+    """
+    user = User.objects.get(pk=user_id)
+    quiz = Quiz.objects.get(pk=quiz_id)
+    result = submit_quiz(user, quiz, {question_id: set(variant_ids) for question_id, variant_ids in selected},
+                         attempt_key=attempt_key)
+    return {'total_score': result.score, 'result_id': result.id}
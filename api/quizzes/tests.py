@@ -1,3 +1,452 @@
-from django.test import TestCase
+import datetime
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from api.courses.entitlements import has_test_access
+from api.quizzes.cache import quiz_cache
+from api.quizzes.models import Quiz, Question, Variant, UserAnswer, UserResults, UserQuizStats
+from api.quizzes.scoring import submit_quiz
+from api.quizzes.sessions import QuizAttemptSession, enqueue_submission
+from api.quizzes.tasks import score_attempt
+from api.users.models import Profile, Role, User
+
+
+class QuizFixtureMixin:
+    def setUp(self):
+        caches[settings.QUIZ_SESSIONS['CACHE_ALIAS']].clear()
+        caches[quiz_cache.alias].clear()
+        quiz_cache.clear_local()
+        role = Role.objects.create(name='student')
+        self.user = User.objects.create_user(email='student@natije.kz', password='secret',
+                                             first_name='Test', last_name='Student', role=role)
+        self.quiz = Quiz.objects.create(title='History')
+        self.single = Question.objects.create(title='Capital?', quiz=self.quiz)
+        self.single_variants = [
+            Variant.objects.create(title=title, question=self.single, is_correct=title == 'Astana')
+            for title in ('Astana', 'Almaty', 'Shymkent')
+        ]
+        self.multiple = Question.objects.create(title='Rivers?', quiz=self.quiz, has_multiple_correct_answers=True)
+        self.multiple_variants = [
+            Variant.objects.create(title=title, question=self.multiple, is_correct=title != 'Volga')
+            for title in ('Irtysh', 'Ili', 'Volga')
+        ]
+
+    def grant_test_access(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.test_limit = timezone.now() + datetime.timedelta(days=1)
+        profile.save()
+
+    def answer(self, *variants):
+        for variant in variants:
+            UserAnswer.objects.create(user=self.user, quiz=self.quiz, question=variant.question,
+                                      selected_choice=variant)
+
+
+class QuizScoringTests(QuizFixtureMixin, TestCase):
+    def test_exact_selection_scores_each_question(self):
+        self.answer(self.single_variants[0], *self.multiple_variants[:2])
+        with self.assertNumQueries(13):
+            result = submit_quiz(self.user, self.quiz)
+        self.assertEqual(result.score, 2)
+        self.assertFalse(UserAnswer.objects.filter(user=self.user, quiz=self.quiz).exists())
+        self.assertEqual(UserResults.objects.get(user=self.user, quiz=self.quiz).score, 2)
+        self.assertEqual(result.selected_variants,
+                         sorted([self.single_variants[0].id, self.multiple_variants[0].id,
+                                 self.multiple_variants[1].id]))
+
+    def test_partial_or_extra_selection_scores_nothing(self):
+        self.answer(*self.single_variants[:2], self.multiple_variants[0])
+        self.assertEqual(submit_quiz(self.user, self.quiz).score, 0)
+
+
+class QuizResultsViewTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.grant_test_access()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_attempt_review_is_rendered_from_the_attempt(self):
+        self.answer(self.single_variants[1])
+        response = self.client.get(f'/api/quizzes/results/{self.quiz.id}/')
+        self.assertEqual(response.json()['total_score'], 0)
+
+        review = self.client.get(f'/api/quizzes/results/{self.quiz.id}/attempts/{response.json()["result_id"]}/')
+        self.assertEqual(review.status_code, 200)
+        self.assertEqual(review.json()['selected_variants'], [self.single_variants[1].id])
+
+
+# Answers are only buffered in a cache the workers share.
+SHARED_CACHES = {**settings.CACHES, 'shared': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'natije-tests-quiz-sessions'),
+}}
+
+
+@override_settings(CACHES=SHARED_CACHES,
+                   QUIZ_SESSIONS={'CACHE_ALIAS': 'shared', 'TIMEOUT': 60, 'AUTOSAVE_INTERVAL': 60})
+class QuizAttemptSessionTests(QuizFixtureMixin, TestCase):
+    def test_toggles_are_buffered_until_submit(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        with self.assertNumQueries(1):
+            self.assertTrue(session.toggle(self.single.id, self.single_variants[1].id))
+            self.assertFalse(session.toggle(self.single.id, self.single_variants[1].id))
+            self.assertTrue(session.toggle(self.single.id, self.single_variants[0].id))
+            self.assertTrue(session.toggle(self.multiple.id, self.multiple_variants[0].id))
+        self.assertFalse(UserAnswer.objects.exists())
+
+        result = UserResults.objects.get(attempt_key=enqueue_submission(self.user, self.quiz))
+        self.assertEqual(result.score, 1)
+        self.assertEqual(result.selected_variants, sorted([self.single_variants[0].id, self.multiple_variants[0].id]))
+        self.assertEqual(session.selected(), {})
+
+    def test_autosave_survives_a_lost_session(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        session.toggle(self.single.id, self.single_variants[0].id)
+        session.save()
+        session.discard()
+
+        self.assertEqual(QuizAttemptSession(self.user.id, self.quiz.id).selected(),
+                         {self.single.id: {self.single_variants[0].id}})
+        attempt_key = enqueue_submission(self.user, self.quiz)
+        self.assertEqual(UserResults.objects.get(attempt_key=attempt_key).score, 1)
+        self.assertFalse(UserAnswer.objects.exists())
+
+    @override_settings(QUIZ_SESSIONS={'CACHE_ALIAS': 'shared', 'TIMEOUT': 60, 'AUTOSAVE_INTERVAL': 0})
+    def test_toggle_autosaves_after_the_interval(self):
+        QuizAttemptSession(self.user.id, self.quiz.id).toggle(self.single.id, self.single_variants[0].id)
+        self.assertTrue(UserAnswer.objects.filter(selected_choice=self.single_variants[0]).exists())
+
+    def test_answers_deselected_after_an_autosave_do_not_reach_the_next_attempt(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        session.toggle(self.single.id, self.single_variants[1].id)
+        session.save()
+        session.toggle(self.single.id, self.single_variants[1].id)
+        session.toggle(self.single.id, self.single_variants[0].id)
+        enqueue_submission(self.user, self.quiz)
+
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertEqual(QuizAttemptSession(self.user.id, self.quiz.id).selected(), {})
+
+    def test_concurrent_toggles_are_all_kept(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        session.toggle(self.single.id, self.single_variants[0].id)
+        loaded, load = threading.Event(), session._load
+
+        def slow_load():
+            # The first toggle holds its copy of the state while the second one runs.
+            state = load()
+            if not loaded.is_set():
+                loaded.set()
+                time.sleep(0.2)
+            return state
+
+        with mock.patch.object(QuizAttemptSession, '_load', side_effect=slow_load):
+            first = threading.Thread(target=session.toggle, args=(self.multiple.id, self.multiple_variants[0].id))
+            first.start()
+            loaded.wait()
+            QuizAttemptSession(self.user.id, self.quiz.id).toggle(self.multiple.id, self.multiple_variants[1].id)
+            first.join()
+
+        self.assertEqual(session.selected(), {
+            self.single.id: {self.single_variants[0].id},
+            self.multiple.id: {self.multiple_variants[0].id, self.multiple_variants[1].id},
+        })
+
+
+@override_settings(QUIZ_SESSIONS={'CACHE_ALIAS': 'default', 'TIMEOUT': 60, 'AUTOSAVE_INTERVAL': 60})
+class LocalQuizAttemptSessionTests(QuizFixtureMixin, TestCase):
+    def test_toggles_are_written_through_with_a_process_local_cache(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        self.assertFalse(session.buffered)
+        self.assertTrue(session.toggle(self.single.id, self.single_variants[0].id))
+        self.assertTrue(session.toggle(self.single.id, self.single_variants[1].id))
+        self.assertFalse(session.toggle(self.single.id, self.single_variants[1].id))
+
+        # Another worker sees them, its cache never had them.
+        self.assertEqual(sorted(UserAnswer.objects.values_list('selected_choice_id', flat=True)),
+                         [self.single_variants[0].id])
+        self.assertEqual(QuizAttemptSession(self.user.id, self.quiz.id).selected(),
+                         {self.single.id: {self.single_variants[0].id}})
+
+    def test_replaced_sheets_are_written_through(self):
+        QuizAttemptSession(self.user.id, self.quiz.id).replace({self.multiple_variants[0].id: self.multiple.id},
+                                                               save=False)
+        self.assertEqual(list(UserAnswer.objects.values_list('selected_choice_id', flat=True)),
+                         [self.multiple_variants[0].id])
+
+
+class UserAnswerSheetViewTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/quizzes/{self.quiz.id}/answers/'
+
+    def test_sheet_replaces_answers_in_one_request(self):
+        self.answer(self.single_variants[1])
+        choices = [self.single_variants[0].id, self.multiple_variants[0].id]
+        response = self.client.post(self.url, {'selected_choices': choices}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(UserAnswer.objects.values_list('selected_choice_id', flat=True)), sorted(choices))
+
+    def test_sheet_can_be_submitted(self):
+        choices = [self.single_variants[0].id, *[variant.id for variant in self.multiple_variants[:2]]]
+        response = self.client.post(self.url, {'selected_choices': choices, 'submit': True}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_score'], 2)
+        self.assertFalse(UserAnswer.objects.exists())
+
+    def test_variants_of_other_quizzes_are_rejected(self):
+        other_question = Question.objects.create(title='Other', quiz=Quiz.objects.create(title='Other'))
+        other_variant = Variant.objects.create(title='Other', question=other_question)
+        response = self.client.post(self.url, {'selected_choices': [self.single_variants[0].id, other_variant.id]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserAnswer.objects.exists())
+
+
+class QuizListViewTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Quiz.objects.create(title='Trial', is_trial=True)
+        self.grant_test_access()
+        self.client = APIClient()
+
+    def test_list_runs_constant_queries(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(4):
+            self.client.get('/api/quizzes/')
+        # Entitlements are cached after the first request.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/quizzes/')
+        quizzes = {quiz['title']: quiz for quiz in response.json()}
+        self.assertEqual(quizzes['History']['question_count'], 2)
+        self.assertTrue(quizzes['History']['request_user_has_access'])
+
+    def test_anonymous_users_only_access_trials(self):
+        response = self.client.get('/api/quizzes/')
+        access = {quiz['title']: quiz['request_user_has_access'] for quiz in response.json()}
+        self.assertEqual(access, {'History': False, 'Trial': True})
+
+
+class QuizPermissionTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/quizzes/{self.quiz.id}/answers/'
+
+    def test_answers_require_test_access(self):
+        choices = {'selected_choices': [self.single_variants[0].id]}
+        self.assertEqual(self.client.post(self.url, choices, format='json').status_code, 403)
+        self.assertEqual(self.client.post(f'/api/quizzes/{self.quiz.id}/submit/').status_code, 403)
+
+        self.grant_test_access()
+        self.assertEqual(self.client.post(self.url, choices, format='json').status_code, 200)
+
+    def test_access_limit_changes_invalidate_entitlements(self):
+        self.grant_test_access()
+        self.assertTrue(has_test_access(self.user))
+        profile = Profile.objects.get(user=self.user)
+        profile.test_limit = timezone.now() - datetime.timedelta(days=1)
+        profile.save()
+        self.assertFalse(has_test_access(self.user))
+
+
+class UserQuizStatsTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for score in (3, 1, 2):
+            UserResults.objects.create(user=self.user, quiz=self.quiz, score=score)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.user.is_superuser = True
+        self.user.save()
+
+    def test_results_update_stats_incrementally(self):
+        stats = UserQuizStats.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((stats.attempt_count, stats.best_score, stats.worst_score, stats.last_score), (3, 3, 1, 2))
+        self.assertEqual([result['score'] for result in stats.week_results], [2, 1, 3])
+
+    def test_quiz_page_reads_the_stats_row(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/quizzes/{self.quiz.id}/questions/')
+        data = response.json()
+        self.assertEqual([question['question_id'] for question in data['question_pagination']],
+                         [self.single.id, self.multiple.id])
+        self.assertEqual(data['user_max_result']['score'], 3)
+        self.assertEqual(data['user_min_result']['score'], 1)
+        self.assertEqual([result['score'] for result in data['user_results']], [2, 1, 3])
+
+    def test_stats_can_be_rebuilt(self):
+        UserQuizStats.objects.all().delete()
+        call_command('rebuild_quiz_stats', stdout=open('/dev/null', 'w'))
+        stats = UserQuizStats.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((stats.attempt_count, stats.best_score, stats.last_score), (3, 3, 2))
+
+    def test_racing_first_results_share_the_stats_row(self):
+        real_get, real_first, missed = QuerySet.get, QuerySet.first, []
+
+        def miss_once(real):
+            # The lookup runs before a concurrent first result commits its stats row.
+            def lookup(queryset, *args, **kwargs):
+                if queryset.model is UserQuizStats and not missed:
+                    missed.append(True)
+                    if real is real_first:
+                        return None
+                    raise UserQuizStats.DoesNotExist
+                return real(queryset, *args, **kwargs)
+            return lookup
+
+        with mock.patch.object(QuerySet, 'get', miss_once(real_get)), \
+                mock.patch.object(QuerySet, 'first', miss_once(real_first)):
+            UserResults.objects.create(user=self.user, quiz=self.quiz, score=4)
+        self.assertEqual(UserResults.objects.count(), 4)
+        stats = UserQuizStats.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((stats.attempt_count, stats.best_score), (4, 4))
+
+
+class UserQuizStatsMigrationTests(QuizFixtureMixin, TransactionTestCase):
+    def test_existing_results_are_folded_into_stats(self):
+        for score in (3, 1, 2):
+            UserResults.objects.create(user=self.user, quiz=self.quiz, score=score)
+        call_command('migrate', 'quizzes', '0002', verbosity=0)
+        try:
+            call_command('migrate', 'quizzes', verbosity=0)
+        finally:
+            call_command('migrate', verbosity=0)
+        stats = UserQuizStats.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((stats.attempt_count, stats.best_score, stats.worst_score, stats.last_score), (3, 3, 1, 2))
+
+
+class QuizPayloadViewTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz.is_trial = True
+        self.quiz.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/quizzes/{self.quiz.id}/full/'
+
+    def test_whole_quiz_in_one_request_without_answers(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        questions = response.json()['questions']
+        self.assertEqual([question['id'] for question in questions], [self.single.id, self.multiple.id])
+        self.assertEqual([variant['title'] for variant in questions[0]['variants']], ['Astana', 'Almaty', 'Shymkent'])
+        self.assertNotIn('is_correct', questions[0]['variants'][0])
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.json(), response.json())
+
+    def test_superusers_get_answers(self):
+        self.user.is_superuser = True
+        self.user.save()
+        variants = self.client.get(self.url).json()['questions'][0]['variants']
+        self.assertEqual([variant['is_correct'] for variant in variants], [True, False, False])
+
+    def test_variant_change_invalidates_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.single_variants[1].title = 'Almaty city'
+        self.single_variants[1].save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['questions'][0]['variants'][1]['title'], 'Almaty city')
+
+    def test_async_view_serves_the_same_payload(self):
+        response = self.client.get(f'/api/quizzes/async/{self.quiz.id}/full/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.client.get(self.url).json())
+
+        self.quiz.is_trial = False
+        self.quiz.save()
+        self.assertEqual(self.client.get(f'/api/quizzes/async/{self.quiz.id}/full/').status_code, 403)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite.')
+class QuizQueryPlanTests(QuizFixtureMixin, TestCase):
+    def assertSearchesBy(self, queryset, *columns):
+        plan = queryset.explain()
+        condition = re.escape(' AND '.join(f'{column}=?' for column in columns))
+        self.assertRegex(plan, rf'SEARCH {queryset.model._meta.db_table} USING (COVERING )?INDEX \S+ \({condition}\)')
+
+    def test_attempt_answers_use_composite_index(self):
+        self.assertSearchesBy(UserAnswer.objects.filter(user=self.user, quiz=self.quiz), 'user_id', 'quiz_id')
+        variant = self.single_variants[0]
+        queryset = UserAnswer.objects.filter(user=self.user, quiz=self.quiz, question=variant.question,
+                                             selected_choice=variant)
+        self.assertSearchesBy(queryset, 'user_id', 'quiz_id', 'question_id', 'selected_choice_id')
+
+    def test_results_history_is_read_in_index_order(self):
+        queryset = UserResults.objects.filter(user=self.user, quiz=self.quiz).order_by('date_added')
+        self.assertSearchesBy(queryset, 'user_id', 'quiz_id')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+
+class QueuedSubmissionTests(QuizFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.grant_test_access()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submit_returns_before_scoring(self):
+        QuizAttemptSession(self.user.id, self.quiz.id).toggle(self.single.id, self.single_variants[0].id)
+        # Queued for a worker instead of run eagerly.
+        with mock.patch.object(score_attempt, 'delay') as delay:
+            response = self.client.post(f'/api/quizzes/{self.quiz.id}/submit/')
+        self.assertEqual(response.status_code, 202)
+        attempt_key = response.json()['attempt_key']
+        self.assertFalse(UserResults.objects.exists())
+        submission_url = f'/api/quizzes/results/{self.quiz.id}/submissions/{attempt_key}/'
+        self.assertEqual(self.client.get(submission_url).status_code, 404)
+
+        self.assertEqual(score_attempt(*delay.call_args.args)['total_score'], 1)
+        response = self.client.get(submission_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score'], 1)
+
+    def test_redelivered_task_stores_the_attempt_once(self):
+        QuizAttemptSession(self.user.id, self.quiz.id).toggle(self.single.id, self.single_variants[0].id)
+        with mock.patch.object(score_attempt, 'delay') as delay:
+            self.client.post(f'/api/quizzes/{self.quiz.id}/submit/')
+
+        first = score_attempt(*delay.call_args.args)
+        self.assertEqual(score_attempt(*delay.call_args.args), first)
+        self.assertEqual(UserResults.objects.count(), 1)
+        self.assertEqual(UserQuizStats.objects.get(user=self.user, quiz=self.quiz).attempt_count, 1)
+
+    def test_scoring_keeps_answers_of_the_next_attempt(self):
+        session = QuizAttemptSession(self.user.id, self.quiz.id)
+        session.toggle(self.single.id, self.single_variants[0].id)
+        session.save()
+        with mock.patch.object(score_attempt, 'delay') as delay:
+            self.client.post(f'/api/quizzes/{self.quiz.id}/submit/')
+        self.assertFalse(UserAnswer.objects.exists())
+
+        # The user starts over before a worker picks the submission up.
+        session.toggle(self.multiple.id, self.multiple_variants[0].id)
+        session.save()
+        score_attempt(*delay.call_args.args)
+        self.assertEqual(list(UserAnswer.objects.values_list('selected_choice_id', flat=True)),
+                         [self.multiple_variants[0].id])
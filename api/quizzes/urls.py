@@ -6,8 +6,14 @@ urlpatterns = [
     path('', views.QuizListCreateView.as_view()),
     path('<int:pk>/', views.QuizDetailUpdateDeleteView.as_view()),
     path('<int:pk>/questions/', views.QuizQuestionsView.as_view()),
+    path('<int:pk>/full/', views.QuizPayloadView.as_view()),
+    path('async/<int:pk>/full/', views.AsyncQuizPayloadView.as_view()),
     path('variants/<int:variant_id>/', views.VariantDeleteUpdateView.as_view()),
     path('<int:pk>/questions/<int:question_id>/', views.QuestionVariantCreateView.as_view()),
+    path('<int:pk>/answers/', views.UserAnswerSheetView.as_view()),
     path('<int:pk>/answers/<int:question_id>/', views.UserAnswersView.as_view()),
-    path('results/<int:pk>/',views.UserAnswerCount.as_view())
+    path('<int:pk>/submit/', views.QuizSubmitView.as_view()),
+    path('results/<int:pk>/',views.UserAnswerCount.as_view()),
+    path('results/<int:pk>/attempts/<int:result_id>/', views.UserResultsReviewView.as_view()),
+    path('results/<int:pk>/submissions/<uuid:attempt_key>/', views.SubmissionResultView.as_view()),
 ]
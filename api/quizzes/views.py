@@ -1,19 +1,30 @@
-from datetime import datetime, timedelta
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.db.models import Count
+from django.http import Http404
 from rest_framework import generics, mixins, views, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.quizzes.models import Quiz, Question, Variant, UserAnswer, UserResults
+from api.cache import acached_response, cached_response
+from api.quizzes.cache import quiz_cache, quiz_namespace
+from api.quizzes.models import Quiz, Question, Variant, UserAnswer, UserResults, UserQuizStats
 from api.quizzes.serializers import (VariantSerializer,
                                      QuizSerializer,
                                      UserAnswerSerializer,
+                                     UserAnswerSheetSerializer,
                                      QuestionSerializer,
                                      UserResultsSerializer)
-from api.quizzes.permissions import IsSuperUserOrReadOnly, IsSuperUser, IsBoughtUser
+from api.quizzes.payload import get_payload_queryset, build_quiz_payload
+from api.quizzes.permissions import IsSuperUserOrReadOnly, IsSuperUser, IsBoughtUser, has_test_access
+from api.quizzes.sessions import QuizAttemptSession, enqueue_submission
+from api.quizzes.stats import get_week_summary
 
 
 class QuizListCreateView(generics.ListCreateAPIView):
-    queryset = Quiz.objects.all()
+    queryset = Quiz.objects.annotate(question_count=Count('question'))
     serializer_class = QuizSerializer
     permission_classes = []
 
@@ -22,6 +33,18 @@ class QuizListCreateView(generics.ListCreateAPIView):
             return [IsSuperUser()]
         return super().get_permissions()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['has_test_access'] = has_test_access(self.request.user)
+        context['user_stats'] = {}
+        if self.request.user.is_authenticated:
+            context['user_stats'] = {
+                stats.quiz_id: stats
+                for stats in UserQuizStats.objects.filter(user_id=self.request.user.id).only('quiz_id', 'best_score',
+                                                                                           'last_score')
+            }
+        return context
+
 
 class QuizDetailUpdateDeleteView(mixins.UpdateModelMixin,
                                  mixins.DestroyModelMixin,
@@ -61,33 +84,59 @@ class QuizQuestionsView(generics.ListCreateAPIView):
     def get(self, request, *args, **kwargs):
         quiz = self.get_object()
         self.check_object_permissions(self.request, quiz)
-        current_week_start = datetime.now().date() - timedelta(days=datetime.now().weekday())
-        current_week_end = current_week_start + timedelta(days=6)
-        serializer = self.get_serializer(quiz)
-        questions_data = serializer.data.get('questions', [])
-        response_data = [{"question_id": question['id'], "idx": idx + 1} for idx, question in enumerate(questions_data)]
-        user_results = UserResults.objects.filter(
-            user=request.user,
-            quiz=quiz,
-            date_added__range=[current_week_start, current_week_end]
-        ).order_by('-date_added')
-        user_results_serializer = UserResultsSerializer(user_results, many=True)
-        results = [{"score": result['score'], "date": result['date_added']} for result in user_results_serializer.data]
-        max_result = max(results, key=lambda x: x['score'], default=None)
-        min_result = min(results, key=lambda x: x['score'], default=None)
+        question_ids = Question.objects.filter(quiz=quiz).order_by('id').values_list('id', flat=True)
+        response_data = [{"question_id": question_id, "idx": idx + 1} for idx, question_id in enumerate(question_ids)]
+        stats = None
+        if request.user.is_authenticated:
+            stats = UserQuizStats.objects.filter(user_id=request.user.id, quiz=quiz).first()
 
         return Response(
-            {"title": serializer.data.get('title'),
+            {"title": quiz.title,
              "question_pagination": response_data,
-             "user_results": results[:10],
-             "user_max_result": max_result,
-             "user_min_result": min_result})
+             **get_week_summary(stats)})
 
     def perform_create(self, serializer):
         quiz = self.get_object()
         serializer.save(quiz=quiz)
 
 
+class QuizPayloadView(views.APIView):
+    permission_classes = [IsSuperUserOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        quiz = get_object_or_404(Quiz.objects.only('id', 'is_trial'), pk=kwargs['pk'])
+        self.check_object_permissions(request, quiz)
+        include_answers = request.user.is_superuser
+
+        def build_data():
+            return build_quiz_payload(get_object_or_404(get_payload_queryset(), pk=quiz.id), include_answers)
+
+        key = 'payload-with-answers' if include_answers else 'payload'
+        return cached_response(request, quiz_cache, quiz_namespace(quiz.id), key, build_data)
+
+
+class AsyncQuizPayloadView(AsyncAPIView):
+    permission_classes = [IsSuperUserOrReadOnly]
+
+    async def get(self, request, *args, **kwargs):
+        quiz = await Quiz.objects.only('id', 'is_trial').filter(pk=kwargs['pk']).afirst()
+        if quiz is None:
+            raise Http404
+        # The access check may read entitlements from the database.
+        await sync_to_async(self.check_object_permissions)(request, quiz)
+        include_answers = request.user.is_superuser
+
+        async def build_data():
+            try:
+                payload_quiz = await get_payload_queryset().aget(pk=quiz.id)
+            except Quiz.DoesNotExist:
+                raise Http404
+            return build_quiz_payload(payload_quiz, include_answers)
+
+        key = 'payload-with-answers' if include_answers else 'payload'
+        return await acached_response(request, quiz_cache, quiz_namespace(quiz.id), key, build_data)
+
+
 class QuestionVariantCreateView(generics.GenericAPIView,
                                 mixins.CreateModelMixin,
                                 mixins.UpdateModelMixin,
@@ -165,79 +214,92 @@ class UserAnswersView(generics.GenericAPIView, mixins.CreateModelMixin):
         question = get_object_or_404(Question, pk=self.kwargs['question_id'])
         return question
 
-    @staticmethod
-    def delete_user_answer(quiz, question, user, selected_choice):
-        user_answer_queryset = UserAnswer.objects.filter(
-            quiz=quiz, question=question, user=user, selected_choice=selected_choice
-        )
-        if user_answer_queryset.exists():
-            user_answer_queryset.delete()
-            return True
-        return False
-
     def post(self, request, *args, **kwargs):
-        user = request.user
         quiz = self.get_quiz_object()
         self.check_object_permissions(request, quiz)
         question = self.get_question_object()
         serializer = UserAnswerSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         selected_choice = serializer.validated_data['selected_choice']
-        if self.delete_user_answer(quiz, question, user, selected_choice):
-            return Response(status=status.HTTP_200_OK)
-        else:
-            UserAnswer.objects.create(
-                quiz=quiz, question=question, selected_choice=selected_choice, user=user
-            )
+        if selected_choice.question_id != question.id:
+            raise ValidationError({'selected_choice': ['Variant does not belong to this question.']})
+
+        session = QuizAttemptSession(request.user.id, quiz.id)
+        if session.toggle(question.id, selected_choice.id):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(status=status.HTTP_200_OK)
+
+
+class UserAnswerSheetView(views.APIView):
+    permission_classes = [IsBoughtUser]
+
+    def post(self, request, *args, **kwargs):
+        quiz = get_object_or_404(Quiz, pk=kwargs['pk'])
+        self.check_object_permissions(request, quiz)
+        serializer = UserAnswerSheetSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        selected_choices = set(serializer.validated_data['selected_choices'])
+
+        answers = dict(Variant.objects.filter(pk__in=selected_choices, question__quiz=quiz)
+                       .values_list('id', 'question_id'))
+        unknown_choices = selected_choices - answers.keys()
+        if unknown_choices:
+            raise ValidationError({'selected_choices': [f'Variant {variant_id} does not belong to this quiz.'
+                                                        for variant_id in sorted(unknown_choices)]})
+
+        submit = serializer.validated_data['submit']
+        # A submitted sheet goes straight to scoring, there is no point saving it first.
+        QuizAttemptSession(request.user.id, quiz.id).replace(answers, save=not submit)
+        if submit:
+            return submission_response(request.user, enqueue_submission(request.user, quiz))
+        return Response({'selected_choices': sorted(answers)}, status=status.HTTP_200_OK)
+
+
+def submission_response(user, attempt_key, done_status=status.HTTP_201_CREATED):
+    """
+    The score when the attempt is already scored, e.g. eagerly, otherwise 202
+    with the attempt key to poll SubmissionResultView with.
+    """
+    result = UserResults.objects.filter(user_id=user.id, attempt_key=attempt_key).first()
+    if result is not None:
+        return Response({'total_score': result.score, 'result_id': result.id}, status=done_status)
+    return Response({'attempt_key': attempt_key}, status=status.HTTP_202_ACCEPTED)
 
 
 class UserAnswerCount(views.APIView):
-    permission_classes = [IsSuperUserOrReadOnly]
+    permission_classes = [IsBoughtUser]
 
     def get(self, request, *args, **kwargs):
         quiz = get_object_or_404(Quiz, pk=kwargs['pk'])
-        user_answers = UserAnswer.objects.filter(user=request.user, quiz=quiz)
-        total_score = 0
-
-        for user_answer in user_answers:
-            question = user_answer.question
-            variants = Variant.objects.filter(question=question)
-
-            variants.update(is_selected=False)
-
-            selected_choice = user_answer.selected_choice
-            if not question.has_multiple_correct_answers:
-                selected_choice.is_selected = True
-                if selected_choice.is_correct:
-                    total_score += 1
-
-            selected_choice.save()
-            user_answer.delete()
-
-        for user_answer in user_answers:
-            question = user_answer.question
-            variants = Variant.objects.filter(question=question)
-
-            variants.update(is_selected=False)
-
-            multiple_answers = UserAnswer.objects.filter(
-                user=request.user, question=question, quiz=quiz
-            )
-            temp_total_score = True
-            for multiple_answer in multiple_answers:
-                selected_choice = multiple_answer.selected_choice
-                if not selected_choice.is_correct:
-                    temp_total_score = False
-                    break
-                selected_choice.is_selected = True
-                selected_choice.save()
-                multiple_answer.delete()
-
-            if temp_total_score:
-                total_score += 1
-        user_results = UserResults.objects.create(quiz=quiz, score=total_score, user=request.user)
-        quiz.user_result = max(quiz.user_result, total_score)
-        quiz.save()
-
-        return Response({'total_score': total_score})
+        self.check_object_permissions(request, quiz)
+        return submission_response(request.user, enqueue_submission(request.user, quiz), done_status=status.HTTP_200_OK)
+
+
+class QuizSubmitView(views.APIView):
+    permission_classes = [IsBoughtUser]
+
+    def post(self, request, *args, **kwargs):
+        quiz = get_object_or_404(Quiz, pk=kwargs['pk'])
+        self.check_object_permissions(request, quiz)
+        return submission_response(request.user, enqueue_submission(request.user, quiz))
+
+
+class UserResultsReviewView(generics.RetrieveAPIView):
+    serializer_class = UserResultsSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_url_kwarg = 'result_id'
+
+    def get_queryset(self):
+        return UserResults.objects.filter(user_id=self.request.user.id, quiz_id=self.kwargs['pk'])
+
+
+class SubmissionResultView(generics.RetrieveAPIView):
+    """
+    The result of a queued submission, 404 until a worker has scored it.
+    """
+    serializer_class = UserResultsSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'attempt_key'
+
+    def get_queryset(self):
+        return UserResults.objects.filter(user_id=self.request.user.id, quiz_id=self.kwargs['pk'])
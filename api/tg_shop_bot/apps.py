@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class TgShopBotConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api.tg_shop_bot'
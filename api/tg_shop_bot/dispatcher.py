@@ -0,0 +1,69 @@
+import asyncio
+import functools
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from api.tg_shop_bot.management.commands.routers import router
+
+
+class DatabaseConnectionMiddleware(BaseMiddleware):
+    """
+    Drop expired or broken database connections after each update, the way
+    Django does at the end of a request. Handlers use the async ORM, whose
+    queries share one thread and so one persistent connection (CONN_MAX_AGE).
+    """
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            await sync_to_async(close_old_connections)()
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Handle at most `limit` updates at a time. Polling starts a task per update,
+    the webhook route bounds its tasks itself.
+    """
+
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, handler, event, data):
+        async with self.semaphore:
+            return await handler(event, data)
+
+
+class StorageBatchMiddleware(BaseMiddleware):
+    """
+    Write the FSM changes made while handling an update in one batch.
+    """
+
+    async def __call__(self, handler, event, data):
+        async with data['fsm_storage'].batch():
+            return await handler(event, data)
+
+
+def get_storage():
+    return import_string(settings.TELEGRAM_BOT['FSM_STORAGE'])()
+
+
+@functools.cache
+def get_dispatcher():
+    """
+    The dispatcher shared by polling (the bot command) and the webhook route.
+    """
+    dispatcher = Dispatcher(storage=get_storage())
+    dispatcher.update.outer_middleware(DatabaseConnectionMiddleware())
+    dispatcher.update.outer_middleware(StorageBatchMiddleware())
+    dispatcher.include_router(router=router)
+    return dispatcher
+
+
+@functools.cache
+def get_bot():
+    return Bot(token=settings.TOKEN)
@@ -1,22 +1,15 @@
-import string
-import random
-
-from django.conf import settings
-from jwt import encode, decode
+from api.courses.access_codes import issue_codes
+from api.courses.models import AccessCode, Course
 
 
 def generate_test_token(type_of_tokens, day=None, course_id=None):
-    characters = string.ascii_uppercase + string.digits
-    generate_code = "".join(random.choice(characters) for _ in range(6))
-
+    """
+    Issue one access code for the course, or for `day` days of quiz access,
+    redeemable at /api/courses/redeem/.
+    """
     if type_of_tokens == "course":
-        return {"type": "course", "course_id": course_id, "code": generate_code}
-
-    payload = {"type": "test", "day": day}
-    jwt_token = encode(payload, settings.SECRET_KEY)
-    return {"generated_code": generate_code, "token": jwt_token}
-
+        code, = issue_codes(1, AccessCode.Kind.COURSE, course=Course.objects.get(pk=course_id))
+        return {"type": "course", "course_id": course_id, "code": code}
 
-def decode_token(token):
-    data = decode(token, settings.SECRET_KEY)
-    return data
+    code, = issue_codes(1, AccessCode.Kind.TEST, days=day)
+    return {"type": "test", "day": day, "code": code}
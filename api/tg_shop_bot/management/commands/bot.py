@@ -1,24 +1,13 @@
-import os
-
-import django
-from django.core.management.base import BaseCommand
 from django.conf import settings
-from aiogram import Bot, Dispatcher
-from aiogram.enums.parse_mode import ParseMode
-
-from .routers import router
-from aiogram.fsm.storage.memory import MemoryStorage
+from django.core.management.base import BaseCommand
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rest.settings")
-os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
-django.setup()
+from api.tg_shop_bot.dispatcher import ConcurrencyLimitMiddleware, get_bot, get_dispatcher
 
 
 class Command(BaseCommand):
-    help = "Telegram bot"
+    help = "Telegram bot (long polling, for development; production uses the webhook route)"
 
     def handle(self, *args, **options):
-        bot = Bot(token=settings.TOKEN, parse_mode=ParseMode.HTML)
-        dp = Dispatcher(storage=MemoryStorage())
-        dp.include_router(router=router)
-        dp.run_polling(bot)
\ No newline at end of file
+        dispatcher = get_dispatcher()
+        dispatcher.update.outer_middleware(ConcurrencyLimitMiddleware(settings.TELEGRAM_BOT['MAX_CONCURRENT_UPDATES']))
+        dispatcher.run_polling(get_bot())
@@ -1,7 +1,5 @@
 from aiogram.fsm.context import FSMContext
-from aiogram.types import (
-    Message, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup
-)
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command, StateFilter
 
@@ -14,28 +12,29 @@ class LoginForm(StatesGroup):
     GET_PIN_CODE = State()
 
 
+def menu_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Курстар", callback_data='Ru'),
+         InlineKeyboardButton(text="Тест", callback_data='Kz')]
+    ])
+
+
 @router.message(Command("start"))
 async def start_handler(msg: Message, state: FSMContext):
-    try:
-        user = await get_user_by_id(msg.from_user.id)
-    except TgAdmin.DoesNotExist:
-        pass
+    user = await get_user_by_id(msg.from_user.id)
     if not user:
         await msg.answer("Pin code: ")
         await state.set_state(LoginForm.GET_PIN_CODE)
     else:
-        kb = ReplyKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Курстар", callback_data='Ru'),
-             InlineKeyboardButton(text="Тест", callback_data='Kz')]
-        ])
-        await msg.answer("Таңдаңыз", reply_markup=kb)
+        await msg.answer("Таңдаңыз", reply_markup=menu_keyboard())
 
 
 @router.message(StateFilter(LoginForm.GET_PIN_CODE))
 async def progress_code(msg: Message, state: FSMContext):
-    pin_code = msg.text.strip()
+    pin_code = (msg.text or "").strip()
     if pin_code == "12345678":
-        TgAdmin.objects.get_or_create(telegram_id=msg.from_user.id)
-        await state.set_state(LoginForm.GET_PIN_CODE)
+        await TgAdmin.objects.aget_or_create(telegram_id=msg.from_user.id)
+        await state.clear()
+        await msg.answer("Таңдаңыз", reply_markup=menu_keyboard())
     else:
         await msg.answer("Қате pin. Қайтадан бастау /start")
@@ -0,0 +1,35 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.tg_shop_bot.dispatcher import get_bot
+
+
+class Command(BaseCommand):
+    help = "Register the webhook route with Telegram, or remove it to go back to polling"
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='?', help='Public URL of the ASGI app, e.g. https://natije.kz')
+        parser.add_argument('--delete', action='store_true', help='Remove the webhook')
+        parser.add_argument('--drop-pending-updates', action='store_true')
+
+    async def apply(self, options):
+        bot = get_bot()
+        try:
+            if options['delete']:
+                await bot.delete_webhook(drop_pending_updates=options['drop_pending_updates'])
+                return 'Webhook removed'
+            url = options['base_url'].rstrip('/') + settings.TELEGRAM_BOT['WEBHOOK_PATH']
+            await bot.set_webhook(
+                url, secret_token=settings.TELEGRAM_BOT['WEBHOOK_SECRET'] or None,
+                max_connections=min(settings.TELEGRAM_BOT['MAX_CONCURRENT_UPDATES'], 100),
+                drop_pending_updates=options['drop_pending_updates'])
+            return f'Webhook set to {url}'
+        finally:
+            await bot.session.close()
+
+    def handle(self, *args, **options):
+        if not options['delete'] and not options['base_url']:
+            raise CommandError('Pass the base URL of the ASGI app or --delete')
+        self.stdout.write(self.style.SUCCESS(asyncio.run(self.apply(options))))
@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class TgAdmin(models.Model):
+    telegram_id = models.BigIntegerField(unique=True)
+    date_added = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.telegram_id)
+
+
+class BotState(models.Model):
+    """
+    FSM state and data of a chat, see api.tg_shop_bot.storage.DatabaseStorage.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    state = models.CharField(max_length=255, null=True, blank=True)
+    data = models.JSONField(default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
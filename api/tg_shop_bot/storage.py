@@ -0,0 +1,149 @@
+import abc
+import contextlib
+import contextvars
+import time
+from datetime import timedelta
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from api.tg_shop_bot.models import BotState
+
+EMPTY_RECORD = {'state': None, 'data': {}}
+
+
+class BufferedStorage(BaseStorage):
+    """
+    FSM storage shared by every bot process. Records not written for
+    TELEGRAM_BOT['FSM_TTL'] seconds expire.
+
+    Inside batch(), which the dispatcher opens around each update, states and
+    data are kept in a buffer of that update only and written in one go when
+    it ends. Outside a batch every change is written right away.
+    """
+
+    def __init__(self):
+        self._batch = contextvars.ContextVar(f'fsm-batch-{id(self)}', default=None)
+
+    @property
+    def options(self):
+        return settings.TELEGRAM_BOT
+
+    def make_key(self, key):
+        return ':'.join(str(part) if part is not None else '' for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.destiny))
+
+    @abc.abstractmethod
+    async def load(self, key):
+        """
+        Return the stored record of a key, None if it has none or it expired.
+        """
+
+    @abc.abstractmethod
+    async def write_many(self, records, deleted):
+        """
+        Store `records` (key -> record) and delete the `deleted` keys.
+        """
+
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        token = self._batch.set({})
+        try:
+            yield
+        finally:
+            pending = self._batch.get()
+            self._batch.reset(token)
+            await self.write(pending)
+
+    async def write(self, pending):
+        if not pending:
+            return
+        records = {key: record for key, record in pending.items() if record != EMPTY_RECORD}
+        deleted = [key for key, record in pending.items() if record == EMPTY_RECORD]
+        await self.write_many(records, deleted)
+
+    async def get_record(self, key):
+        key = self.make_key(key)
+        pending = self._batch.get()
+        if pending is not None and key in pending:
+            return pending[key]
+        return await self.load(key) or EMPTY_RECORD
+
+    async def put_record(self, key, record):
+        pending = self._batch.get()
+        if pending is None:
+            await self.write({self.make_key(key): record})
+        else:
+            pending[self.make_key(key)] = record
+
+    async def set_state(self, key, state=None):
+        record = await self.get_record(key)
+        state = state.state if isinstance(state, State) else state
+        await self.put_record(key, {'state': state, 'data': record['data']})
+
+    async def get_state(self, key):
+        return (await self.get_record(key))['state']
+
+    async def set_data(self, key, data):
+        record = await self.get_record(key)
+        await self.put_record(key, {'state': record['state'], 'data': dict(data)})
+
+    async def get_data(self, key):
+        return dict((await self.get_record(key))['data'])
+
+    async def close(self):
+        pass
+
+
+class CacheStorage(BufferedStorage):
+    """
+    Keep FSM records in TELEGRAM_BOT['CACHE_ALIAS'], which must be shared by
+    the bot processes (e.g. Redis) for them to share states.
+    """
+
+    @property
+    def cache(self):
+        return caches[self.options['CACHE_ALIAS']]
+
+    def make_key(self, key):
+        return f'tg_shop_bot:fsm:{super().make_key(key)}'
+
+    async def load(self, key):
+        return await self.cache.aget(key)
+
+    async def write_many(self, records, deleted):
+        if records:
+            await self.cache.aset_many(records, timeout=self.options['FSM_TTL'])
+        if deleted:
+            await self.cache.adelete_many(deleted)
+
+
+class DatabaseStorage(BufferedStorage):
+    """
+    Keep FSM records in the BotState table. Expired rows are ignored on read
+    and deleted by a write at most every TELEGRAM_BOT['FSM_EVICT_INTERVAL'] seconds.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._evicted_at = time.monotonic()
+
+    async def load(self, key):
+        return await BotState.objects.filter(key=key, expires_at__gt=timezone.now()).values('state', 'data').afirst()
+
+    async def write_many(self, records, deleted):
+        now = timezone.now()
+        if records:
+            expires_at = now + timedelta(seconds=self.options['FSM_TTL'])
+            await BotState.objects.abulk_create(
+                [BotState(key=key, state=record['state'], data=record['data'], expires_at=expires_at)
+                 for key, record in records.items()],
+                update_conflicts=True, unique_fields=['key'], update_fields=['state', 'data', 'expires_at'])
+        if deleted:
+            await BotState.objects.filter(key__in=deleted).adelete()
+        if time.monotonic() - self._evicted_at >= self.options['FSM_EVICT_INTERVAL']:
+            self._evicted_at = time.monotonic()
+            await BotState.objects.filter(expires_at__lte=now).adelete()
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import StorageKey
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.courses.access_codes import redeem_code
+from api.courses.entitlements import owns_course
+from api.courses.models import Course
+from api.tg_shop_bot.dispatcher import ConcurrencyLimitMiddleware, get_dispatcher
+from api.tg_shop_bot.management.commands.routers.router_start import LoginForm
+from api.tg_shop_bot.models import BotState, TgAdmin
+from api.tg_shop_bot.helpers import generate_test_token
+from api.tg_shop_bot.storage import CacheStorage, DatabaseStorage
+from api.tg_shop_bot.webhook import TelegramWebhook
+from api.users.models import Profile, Role, User
+
+
+def make_update(update_id, user_id, text):
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Test'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+            'text': text,
+            **({'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]}
+               if text.startswith('/') else {}),
+        },
+    }
+
+
+class FakeTelegramAPI:
+    """
+    A local Telegram Bot API: getUpdates hands out the queued updates once,
+    sendMessage records the reply after `latency` seconds.
+    """
+
+    def __init__(self, updates=(), latency=0.0):
+        self.updates = list(updates)
+        self.latency = latency
+        self.sent = []
+        self.in_flight = self.max_in_flight = 0
+        self.replied = asyncio.Event()
+        self.expected_replies = len(self.updates)
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.dispatch)
+        self.server = TestServer(app)
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.server.close()
+
+    def make_bot(self):
+        api = TelegramAPIServer.from_base(str(self.server.make_url('')))
+        return Bot(token='42:TEST', session=AiohttpSession(api=api))
+
+    async def dispatch(self, request):
+        method = request.match_info['method']
+        data = dict(await request.post())
+        if method == 'getUpdates':
+            updates, self.updates = self.updates, []
+            if not updates:
+                await asyncio.sleep(0.05)
+            return web.json_response({'ok': True, 'result': updates})
+        if method == 'sendMessage':
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(self.latency)
+            self.in_flight -= 1
+            self.sent.append(data)
+            if len(self.sent) >= self.expected_replies:
+                self.replied.set()
+            return web.json_response({'ok': True, 'result': {
+                'message_id': len(self.sent), 'date': int(time.time()),
+                'chat': {'id': int(data['chat_id']), 'type': 'private'}, 'text': data['text'],
+            }})
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {'id': 42, 'is_bot': True, 'first_name': 'Natije'}})
+        return web.json_response({'ok': True, 'result': True})
+
+    def replies_to(self, user_id):
+        return [message['text'] for message in self.sent
+                if int(message['chat_id']) == user_id]
+
+
+class BotHandlerTests(TestCase):
+    async def feed(self, api, *updates):
+        async with api:
+            bot = api.make_bot()
+            try:
+                for update in updates:
+                    await get_dispatcher().feed_raw_update(bot, update)
+            finally:
+                await bot.session.close()
+
+    async def test_pin_code_login(self):
+        api = FakeTelegramAPI()
+        await self.feed(api, make_update(1, 1001, '/start'), make_update(2, 1001, '0000'),
+                        make_update(3, 1001, '12345678'), make_update(4, 1001, '/start'))
+
+        self.assertEqual(api.replies_to(1001), ['Pin code: ', 'Қате pin. Қайтадан бастау /start',
+                                                'Таңдаңыз', 'Таңдаңыз'])
+        self.assertTrue(await TgAdmin.objects.filter(telegram_id=1001).aexists())
+
+    async def test_known_admin_gets_the_menu(self):
+        await TgAdmin.objects.acreate(telegram_id=1002)
+        api = FakeTelegramAPI()
+        await self.feed(api, make_update(1, 1002, '/start'))
+
+        self.assertEqual(api.replies_to(1002), ['Таңдаңыз'])
+        self.assertIn('reply_markup', api.sent[0])
+
+
+class BotThroughputTests(TestCase):
+    updates = 40
+    latency = 0.1
+
+    async def test_polled_updates_are_handled_concurrently(self):
+        api = FakeTelegramAPI([make_update(i, 2000 + i, '/start') for i in range(1, self.updates + 1)],
+                              latency=self.latency)
+        dispatcher = get_dispatcher()
+        async with api:
+            polling = asyncio.create_task(dispatcher.start_polling(
+                api.make_bot(), polling_timeout=0, handle_signals=False))
+            try:
+                await asyncio.wait_for(api.replied.wait(), timeout=30)
+            finally:
+                await dispatcher.stop_polling()
+                await polling
+
+        self.assertEqual(len(api.sent), self.updates)
+        self.assertEqual({int(message['chat_id']) for message in api.sent},
+                         set(range(2001, 2001 + self.updates)))
+        # Handled one after another, a single reply would be in flight at a time.
+        self.assertGreater(api.max_in_flight, 1)
+
+    async def test_polling_concurrency_is_bounded(self):
+        middleware, in_flight, max_in_flight = ConcurrencyLimitMiddleware(3), 0, 0
+
+        async def handler(event, data):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        await asyncio.gather(*(middleware(handler, None, {}) for _ in range(10)))
+        self.assertEqual(max_in_flight, 3)
+
+
+async def fallback_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# Update ids must be seen by every worker, the webhook refuses a process-local cache.
+SHARED_CACHES = {**settings.CACHES, 'shared': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'natije-tests-shared-cache'),
+}}
+
+
+@override_settings(CACHES=SHARED_CACHES, TELEGRAM_BOT={**settings.TELEGRAM_BOT, 'WEBHOOK_SECRET': 'webhook-secret',
+                                                       'CACHE_ALIAS': 'shared', 'MAX_CONCURRENT_UPDATES': 3})
+class WebhookTests(TestCase):
+    # Updates as Telegram posted them to the webhook: a new user logging in.
+    recorded_updates = [make_update(501, 3001, '/start'), make_update(502, 3001, '12345678'),
+                        make_update(503, 3001, '/start')]
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['shared'].clear()
+
+    async def post(self, webhook, body, path='/telegram/webhook/', secret='webhook-secret', method='POST'):
+        headers = [(b'content-type', b'application/json')]
+        if secret:
+            headers.append((b'x-telegram-bot-api-secret-token', secret.encode()))
+        communicator = ApplicationCommunicator(webhook, {
+            'type': 'http', 'method': method, 'path': path, 'headers': headers,
+        })
+        await communicator.send_input({'type': 'http.request', 'body': body})
+        response = await communicator.receive_output(timeout=5)
+        await communicator.receive_output(timeout=5)
+        return response['status']
+
+    async def test_recorded_updates_are_handled(self):
+        async with FakeTelegramAPI() as api:
+            webhook = TelegramWebhook(fallback_app, bot=api.make_bot())
+            for update in self.recorded_updates:
+                self.assertEqual(await self.post(webhook, json.dumps(update).encode()), 200)
+                await webhook.join()
+            await webhook.bot.session.close()
+
+        self.assertEqual(api.replies_to(3001), ['Pin code: ', 'Таңдаңыз', 'Таңдаңыз'])
+        self.assertTrue(await TgAdmin.objects.filter(telegram_id=3001).aexists())
+
+    async def test_redelivered_updates_are_handled_once(self):
+        async with FakeTelegramAPI() as api:
+            webhook = TelegramWebhook(fallback_app, bot=api.make_bot())
+            body = json.dumps(make_update(601, 3002, '/start')).encode()
+            for _ in range(3):
+                self.assertEqual(await self.post(webhook, body), 200)
+            await webhook.join()
+            await webhook.bot.session.close()
+
+        self.assertEqual(api.replies_to(3002), ['Pin code: '])
+
+    async def test_concurrent_handlers_are_bounded(self):
+        async with FakeTelegramAPI(latency=0.05) as api:
+            webhook = TelegramWebhook(fallback_app, bot=api.make_bot())
+            await asyncio.gather(*(self.post(webhook, json.dumps(make_update(700 + i, 4000 + i, '/start')).encode())
+                                   for i in range(10)))
+            await webhook.join()
+            await webhook.bot.session.close()
+
+        self.assertEqual(len(api.sent), 10)
+        self.assertEqual(api.max_in_flight, 3)
+
+    async def test_rejects_requests_without_the_secret(self):
+        webhook = TelegramWebhook(fallback_app, bot=object())
+        body = json.dumps(make_update(801, 3003, '/start')).encode()
+        self.assertEqual(await self.post(webhook, body, secret=None), 403)
+        self.assertEqual(await self.post(webhook, body, secret='wrong'), 403)
+        self.assertEqual(await self.post(webhook, b'not json'), 400)
+        self.assertEqual(await self.post(webhook, b'', method='GET'), 405)
+        self.assertFalse(webhook._tasks)
+
+    async def test_rejects_every_update_without_a_configured_secret(self):
+        webhook = TelegramWebhook(fallback_app, bot=object())
+        body = json.dumps(make_update(802, 3004, '/start')).encode()
+        with self.settings(TELEGRAM_BOT={**settings.TELEGRAM_BOT, 'WEBHOOK_SECRET': ''}):
+            self.assertEqual(await self.post(webhook, body, secret=None), 403)
+            self.assertEqual(await self.post(webhook, body, secret='anything'), 403)
+        self.assertFalse(webhook._tasks)
+
+    def test_requires_a_shared_cache(self):
+        with self.settings(TELEGRAM_BOT={**settings.TELEGRAM_BOT, 'CACHE_ALIAS': 'default'}):
+            with self.assertRaises(ImproperlyConfigured):
+                TelegramWebhook(fallback_app)
+
+    async def test_other_paths_reach_django(self):
+        webhook = TelegramWebhook(fallback_app, bot=object())
+        self.assertEqual(await self.post(webhook, b'', path='/api/courses/', method='GET'), 404)
+
+
+class StorageTestsMixin:
+    storage_class = None
+    key = StorageKey(bot_id=42, chat_id=5001, user_id=5001)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    async def test_writes_are_batched_until_the_update_ends(self):
+        storage, other_worker = self.storage_class(), self.storage_class()
+        async with storage.batch():
+            await storage.set_state(self.key, LoginForm.GET_PIN_CODE)
+            await storage.update_data(self.key, {'attempts': 1})
+
+            self.assertEqual(await storage.get_state(self.key), LoginForm.GET_PIN_CODE.state)
+            self.assertIsNone(await other_worker.get_state(self.key))
+
+        self.assertEqual(await other_worker.get_state(self.key), LoginForm.GET_PIN_CODE.state)
+        self.assertEqual(await other_worker.get_data(self.key), {'attempts': 1})
+
+    async def test_concurrent_updates_write_only_their_own_changes(self):
+        storage, other_worker = self.storage_class(), self.storage_class()
+        other_key = StorageKey(bot_id=42, chat_id=5003, user_id=5003)
+        first_set, second_done = asyncio.Event(), asyncio.Event()
+
+        async def first_update():
+            async with storage.batch():
+                await storage.set_state(self.key, LoginForm.GET_PIN_CODE)
+                first_set.set()
+                await second_done.wait()
+                self.assertIsNone(await other_worker.get_state(self.key))
+
+        async def second_update():
+            await first_set.wait()
+            async with storage.batch():
+                await storage.set_state(other_key, LoginForm.GET_PIN_CODE)
+            second_done.set()
+
+        await asyncio.gather(first_update(), second_update())
+        self.assertEqual(await other_worker.get_state(self.key), LoginForm.GET_PIN_CODE.state)
+        self.assertEqual(await other_worker.get_state(other_key), LoginForm.GET_PIN_CODE.state)
+
+    async def test_cleared_state_is_removed(self):
+        storage = self.storage_class()
+        await storage.set_state(self.key, LoginForm.GET_PIN_CODE)
+        async with storage.batch():
+            await storage.set_state(self.key, None)
+            await storage.set_data(self.key, {})
+
+        self.assertIsNone(await self.storage_class().get_state(self.key))
+
+
+class DatabaseStorageTests(StorageTestsMixin, TestCase):
+    storage_class = DatabaseStorage
+
+    async def test_expired_states_are_ignored_and_evicted(self):
+        storage = self.storage_class()
+        await storage.set_state(self.key, LoginForm.GET_PIN_CODE)
+        await BotState.objects.aupdate(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(await self.storage_class().get_state(self.key))
+
+        storage._evicted_at -= settings.TELEGRAM_BOT['FSM_EVICT_INTERVAL']
+        await storage.set_state(StorageKey(bot_id=42, chat_id=5002, user_id=5002), LoginForm.GET_PIN_CODE)
+        self.assertEqual([state.key async for state in BotState.objects.all()], ['42:5002:5002::default'])
+
+
+class CacheStorageTests(StorageTestsMixin, TestCase):
+    storage_class = CacheStorage
+
+
+class SharedStateTests(TestCase):
+    async def test_login_state_survives_a_restart(self):
+        async with FakeTelegramAPI() as api:
+            bot = api.make_bot()
+            await get_dispatcher().feed_raw_update(bot, make_update(1, 6001, '/start'))
+            self.assertEqual(await BotState.objects.filter(state=LoginForm.GET_PIN_CODE.state).acount(), 1)
+
+            # A new process starts with an empty dispatcher storage.
+            get_dispatcher().fsm.storage = DatabaseStorage()
+            await get_dispatcher().feed_raw_update(bot, make_update(2, 6001, '12345678'))
+            await bot.session.close()
+
+        self.assertEqual(api.replies_to(6001), ['Pin code: ', 'Таңдаңыз'])
+        self.assertFalse(await BotState.objects.aexists())
+
+
+class AccessCodeHelperTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        role = Role.objects.create(name='student')
+        self.user = User.objects.create_user(email='student@natije.kz', password='secret',
+                                             first_name='Test', last_name='Student', role=role)
+        self.course = Course.objects.create(name='Math', description='Algebra', price=100,
+                                            image='medias/courses/images/math.png', user=self.user)
+
+    def test_handed_out_codes_can_be_redeemed(self):
+        course_code = generate_test_token('course', course_id=self.course.id)
+        redeem_code(self.user.id, course_code['code'])
+        self.assertTrue(owns_course(self.user, self.course.id))
+
+        test_code = generate_test_token('test', day=7)
+        redeem_code(self.user.id, test_code['code'])
+        self.assertGreater(Profile.objects.get(user=self.user).test_limit, timezone.now() + timedelta(days=6))
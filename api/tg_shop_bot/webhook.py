@@ -0,0 +1,123 @@
+import asyncio
+import hmac
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from api.cache import is_process_local
+from api.tg_shop_bot.dispatcher import get_bot, get_dispatcher
+
+
+class TelegramWebhook:
+    """
+    ASGI app that feeds updates posted by Telegram to WEBHOOK_PATH into the bot
+    dispatcher and passes every other request on to `app`.
+
+    Updates are acknowledged as soon as they are queued and handled as tasks,
+    at most MAX_CONCURRENT_UPDATES at a time: past that, webhook requests wait
+    for a free slot, which in turn holds back Telegram. Update ids are recorded
+    in CACHE_ALIAS so redelivered updates are handled once across workers,
+    which is why that cache must be shared by them.
+
+    Without a WEBHOOK_SECRET every update is rejected.
+    """
+
+    def __init__(self, app, bot=None):
+        self.app = app
+        self._bot = bot
+        self._semaphore = None
+        self._tasks = set()
+        if self.options['WEBHOOK_SECRET'] and is_process_local(self.cache):
+            raise ImproperlyConfigured(
+                "TELEGRAM_BOT['CACHE_ALIAS'] must name a cache shared by the workers, e.g. Redis, "
+                "for the webhook to handle redelivered updates once.")
+
+    @property
+    def options(self):
+        return settings.TELEGRAM_BOT
+
+    @property
+    def cache(self):
+        return caches[self.options['CACHE_ALIAS']]
+
+    @property
+    def bot(self):
+        if self._bot is None:
+            self._bot = get_bot()
+        return self._bot
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.options['MAX_CONCURRENT_UPDATES'])
+        return self._semaphore
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['path'] == self.options['WEBHOOK_PATH']:
+            return await self.handle(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.join()
+                if self._bot is not None:
+                    await self._bot.session.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        if scope['method'] != 'POST':
+            return await self.respond(send, 405)
+
+        headers = dict(scope['headers'])
+        secret = self.options['WEBHOOK_SECRET']
+        if not secret or not hmac.compare_digest(
+                headers.get(b'x-telegram-bot-api-secret-token', b''), secret.encode()):
+            return await self.respond(send, 403)
+
+        try:
+            update = json.loads(await self.read_body(receive))
+            update_id = int(update['update_id'])
+        except (ValueError, TypeError, KeyError):
+            return await self.respond(send, 400)
+
+        if await self.cache.aadd(f'tg_shop_bot:update:{update_id}', True, timeout=self.options['DEDUP_TTL']):
+            await self.semaphore.acquire()
+            task = asyncio.create_task(self.process(update))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        await self.respond(send, 200)
+
+    async def process(self, update):
+        try:
+            await get_dispatcher().feed_raw_update(self.bot, update)
+        finally:
+            self.semaphore.release()
+
+    async def join(self):
+        """
+        Wait for the updates being handled.
+        """
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def read_body(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    async def respond(self, send, status):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': b'{}'})
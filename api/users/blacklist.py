@@ -0,0 +1,111 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and about `error_rate` false
+    positives once `capacity` items were added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenBlacklist:
+    """
+    Answers "is this JTI blacklisted?" with at most one cheap query in the
+    common case. Tokens blacklisted by this process, or by any process when
+    the cache alias is shared, are kept in the cache until they expire. A
+    per-process bloom filter over the blacklisted, unexpired tokens is rebuilt
+    every TOKEN_BLACKLIST['REBUILD_INTERVAL'] seconds. In between, a miss
+    first adds the rows blacklisted since (a primary key range, usually
+    empty), so tokens blacklisted by other processes are never missed. Only
+    filter hits are confirmed against BlacklistedToken.
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._built_at = 0
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def options(self):
+        return settings.TOKEN_BLACKLIST
+
+    @property
+    def cache(self):
+        return caches[self.options['CACHE_ALIAS']]
+
+    def _cache_key(self, jti):
+        return f'users:blacklist:{jti}'
+
+    def get_filter(self):
+        with self._lock:
+            if self._filter is None or time.monotonic() - self._built_at >= self.options['REBUILD_INTERVAL']:
+                last_id = BlacklistedToken.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+                jtis = BlacklistedToken.objects.filter(
+                    pk__lte=last_id, token__expires_at__gt=timezone.now()).values_list('token__jti', flat=True)
+                bloom_filter = BloomFilter(self.options['FILTER_CAPACITY'], self.options['FILTER_ERROR_RATE'])
+                for jti in jtis.iterator():
+                    bloom_filter.add(jti)
+                self._filter, self._built_at, self._last_id = bloom_filter, time.monotonic(), last_id
+            return self._filter
+
+    def catch_up(self):
+        """
+        Add the tokens blacklisted since the filter was built or last caught up.
+        """
+        bloom_filter = self.get_filter()
+        with self._lock:
+            for token_id, jti in BlacklistedToken.objects.filter(pk__gt=self._last_id).values_list('pk', 'token__jti'):
+                bloom_filter.add(jti)
+                self._last_id = max(self._last_id, token_id)
+        return bloom_filter
+
+    def add(self, jti, expires_at):
+        """
+        Record a token blacklisted in the database until it expires.
+        """
+        timeout = max(1, int(expires_at - time.time()))
+        self.cache.set(self._cache_key(jti), True, timeout=timeout)
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def __contains__(self, jti):
+        if self.cache.get(self._cache_key(jti)):
+            return True
+        if jti not in self.get_filter() and jti not in self.catch_up():
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+
+token_blacklist = TokenBlacklist()
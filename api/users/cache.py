@@ -0,0 +1,12 @@
+from api.cache import VersionedCache
+
+profile_cache = VersionedCache('users')
+
+
+def profile_namespace(user_id):
+    return f'profile-{user_id}'
+
+
+def bump_profile_version(user_id):
+    if user_id is not None:
+        profile_cache.bump(profile_namespace(user_id))
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import BCryptSHA256PasswordHasher
+
+
+class ConfigurableBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """
+    bcrypt with the cost factor taken from PASSWORD_HASHING['ROUNDS'], so it can
+    be tuned per environment. Hashes made with another cost are rehashed with
+    the configured one the next time their user logs in.
+    """
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_HASHING['ROUNDS']
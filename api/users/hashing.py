@@ -0,0 +1,66 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from api.users.models import User
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING['MAX_WORKERS'],
+                                       thread_name_prefix='password-hashing')
+    return _executor
+
+
+async def _run_in_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _verify_password(password, encoded):
+    """
+    Return whether the password matches and whether its hash must be upgraded.
+    """
+    must_update = []
+    is_correct = check_password(password, encoded, setter=lambda raw_password: must_update.append(True))
+    return is_correct, bool(must_update)
+
+
+async def amake_password(password):
+    """
+    Hash a password on the hashing pool instead of the event loop.
+    """
+    return await _run_in_pool(make_password, password)
+
+
+async def acheck_password(user, password):
+    """
+    Check a user's password on the hashing pool, rehashing it when it was made
+    with another hasher or cost than the configured one.
+    """
+    is_correct, must_update = await _run_in_pool(_verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+async def aauthenticate(email, password):
+    """
+    Async counterpart of ModelBackend.authenticate() for the email and password login.
+    """
+    user = await User.objects.select_related('role').filter(email=email).afirst()
+    if user is None:
+        # Hash anyway so unknown emails take as long as wrong passwords.
+        await amake_password(password)
+        return None
+    if await acheck_password(user, password) and user.is_active:
+        return user
+    return None
@@ -0,0 +1,41 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.users.hashers import ConfigurableBCryptSHA256PasswordHasher
+
+
+class Command(BaseCommand):
+    help = 'Measure password checks per second for bcrypt cost factors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13], help='Cost factors to measure')
+        parser.add_argument('--iterations', type=int, default=20, help='Password checks per worker')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads checking in parallel')
+
+    def handle(self, *args, **options):
+        hasher = ConfigurableBCryptSHA256PasswordHasher()
+        password = 'correct horse battery staple'
+        iterations, workers = options['iterations'], options['workers']
+
+        self.stdout.write(f'Configured cost: {settings.PASSWORD_HASHING["ROUNDS"]}, {workers} workers')
+        self.stdout.write(f'{"rounds":>6} {"ms/login":>10} {"logins/s/core":>14} {"logins/s total":>15}')
+        for rounds in options['rounds']:
+            encoded = hasher.encode(password, bcrypt.gensalt(rounds))
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                hasher.verify(password, encoded)
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda _: hasher.verify(password, encoded), range(iterations * workers)))
+            parallel = time.perf_counter() - started
+
+            self.stdout.write(f'{rounds:>6} {single / iterations * 1000:>10.1f} {iterations / single:>14.1f} '
+                              f'{iterations * workers / parallel:>15.1f}')
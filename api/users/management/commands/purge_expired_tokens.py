@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per transaction')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)
+        purged = 0
+        while True:
+            # Short transactions keep the token tables available to logins and refreshes.
+            with transaction.atomic():
+                token_ids = list(expired[:options['batch_size']])
+                if not token_ids:
+                    break
+                BlacklistedToken.objects.filter(token_id__in=token_ids).delete()
+                OutstandingToken.objects.filter(pk__in=token_ids).delete()
+            purged += len(token_ids)
+            self.stdout.write(f'Purged {purged} tokens')
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired tokens'))
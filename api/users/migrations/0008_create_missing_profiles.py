@@ -0,0 +1,26 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+def create_missing_profiles(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Profile = apps.get_model('users', 'Profile')
+    users = User.objects.filter(profile__isnull=True).values_list('id', flat=True)
+    Profile.objects.bulk_create([Profile(user_id=user_id) for user_id in users], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_profile_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='test_limit',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
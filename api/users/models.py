@@ -1,4 +1,5 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 
@@ -10,7 +11,27 @@ class UserManager(BaseUserManager):
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
-        user.save(using=self._db)
+        self._save_new_user(user)
+        return user
+
+    def _save_new_user(self, user):
+        # The profile is created by a post_save receiver, see api.users.signals.
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+
+    async def acreate_user(self, email, password=None, **extra_fields):
+        """
+        Like create_user(), with the password hashed on the hashing pool.
+        """
+        from api.users.hashing import amake_password
+
+        if not email:
+            raise ValueError('The Email field must be set')
+
+        email = self.normalize_email(email)
+        user = self.model(email=email, **extra_fields)
+        user.password = await amake_password(password)
+        await sync_to_async(self._save_new_user)(user)
         return user
 
     def create_superuser(self, email, password=None, **extra_fields):
@@ -57,6 +78,10 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def role_name(self):
+        return self.role.name
+
 
 class Profile(models.Model):
     profile_picture = models.ImageField(upload_to='medias/profile_pictures', null=True)
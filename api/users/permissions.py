@@ -6,7 +6,7 @@ from rest_framework.exceptions import PermissionDenied
 class IsTeacherUser(BasePermission):
     def has_permission(self, request, view):
         user = request.user
-        if user and user.role.name == "teacher":
+        if user and user.role_name == "teacher":
             return True
         else:
             raise PermissionDenied("You don't have permission to access this page")
@@ -20,4 +20,4 @@ class IsOwnerUser(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         user = request.user
-        return obj.user == user
+        return obj.user_id == user.id
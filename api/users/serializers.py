@@ -22,6 +22,11 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class LoginSerializer(serializers.Serializer):
+    email = serializers.CharField()
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'}, trim_whitespace=False)
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -33,7 +38,10 @@ class ProfileSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user_data = validated_data.pop('user')
         user = UserSerializer.create(UserSerializer(), validated_data=user_data)
-        profile = Profile.objects.create(user=user, **validated_data)
+        profile = user.profile
+        for attr, value in validated_data.items():
+            setattr(profile, attr, value)
+        profile.save()
         return profile
 
 
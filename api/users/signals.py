@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.users.cache import bump_profile_version
+from api.users.models import Profile, Role, User
+
+
+@receiver(post_save, sender=User)
+def create_profile_for_new_user(sender, instance, created, raw, using, **kwargs):
+    # Every way of creating a user gets a profile: the manager, the admin, User.objects.create().
+    if created and not raw:
+        Profile.objects.using(using).create(user=instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def bump_profile_cache_on_profile_change(sender, instance, **kwargs):
+    bump_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_profile_cache_on_user_change(sender, instance, **kwargs):
+    bump_profile_version(instance.pk)
+
+
+@receiver(post_save, sender=Role)
+def bump_profile_cache_on_role_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    for user_id in User.objects.filter(role=instance).values_list('id', flat=True).iterator():
+        bump_profile_version(user_id)
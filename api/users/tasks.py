@@ -0,0 +1,12 @@
+from celery import shared_task
+from django.db import OperationalError
+
+from api.users.models import User
+
+
+@shared_task(autoretry_for=(OperationalError,), max_retries=5, retry_backoff=True)
+def delete_user_account(user_id):
+    """
+    Delete a deactivated account with its profile, courses, purchases and quiz history.
+    """
+    User.objects.filter(pk=user_id, is_active=False).delete()
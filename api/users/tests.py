@@ -1,3 +1,233 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.courses.models import Course
+from api.users.blacklist import BloomFilter, token_blacklist
+from api.users.models import Profile, Role, User
+from api.users.tokens import BlacklistRefreshToken
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.teacher_role = Role.objects.create(name='teacher')
+        self.user = User.objects.create_user(email='teacher@natije.kz', password='secret',
+                                             first_name='Test', last_name='Teacher', role=self.teacher_role)
+        self.client = APIClient()
+
+    def obtain_access_token(self):
+        response = self.client.post('/api/users/token/', {'email': 'teacher@natije.kz', 'password': 'secret'})
+        return response.json()['access']
+
+    def test_tokens_carry_permission_claims(self):
+        token = AccessToken(self.obtain_access_token())
+        self.assertEqual(token['role'], 'teacher')
+        self.assertFalse(token['is_superuser'])
+        self.assertIsNotNone(token['test_limit'])
+
+    def test_requests_do_not_read_the_users_table(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/courses/', {'name': 'Math', 'description': 'Algebra', 'price': 100})
+        # The teacher check passes from the role claim, the payload is then rejected for the missing image.
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+        self.assertFalse([query for query in queries if 'FROM "users_user"' in query['sql']])
+
+    def test_teacher_creates_a_course_from_the_claims(self):
+        image = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(image, 'PNG')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            response = self.client.post('/api/courses/', {
+                'name': 'Math', 'description': 'Algebra', 'price': 100,
+                'image': SimpleUploadedFile('math.png', image.getvalue(), content_type='image/png'),
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Course.objects.get(name='Math').user_id, self.user.id)
+
+    def test_refresh_signs_current_claims(self):
+        refresh = self.client.post('/api/users/token/', {'email': 'teacher@natije.kz',
+                                                          'password': 'secret'}).json()['refresh']
+        self.user.role = Role.objects.create(name='student')
+        self.user.save()
+        access = self.client.post('/api/users/token/refresh/', {'refresh': refresh}).json()['access']
+        self.assertEqual(AccessToken(access)['role'], 'student')
+
+    def test_refresh_rejects_deactivated_and_deleted_accounts(self):
+        refresh = self.client.post('/api/users/token/', {'email': 'teacher@natije.kz',
+                                                          'password': 'secret'}).json()['refresh']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.post('/api/users/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(self.client.post('/api/users/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    def test_profile_view_loads_the_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'teacher@natije.kz')
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        token_blacklist.reset()
+        role = Role.objects.create(name='student')
+        self.user = User.objects.create_user(email='student@natije.kz', password='secret',
+                                             first_name='Test', last_name='Student', role=role)
+        self.client = APIClient()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom_filter = BloomFilter(capacity=100)
+        for i in range(100):
+            bloom_filter.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom_filter for i in range(100)))
+        false_positives = sum(f'other-{i}' in bloom_filter for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_logout_blacklists_the_refresh_token(self):
+        refresh = str(BlacklistRefreshToken.for_user(self.user))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post('/api/users/logout/', {'refresh_token': refresh}).status_code, 200)
+
+        response = self.client.post('/api/users/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_blacklist_survives_a_lost_cache(self):
+        refresh = BlacklistRefreshToken.for_user(self.user)
+        refresh.blacklist()
+        caches['default'].clear()
+        token_blacklist.reset()
+        self.assertIn(refresh['jti'], token_blacklist)
+
+    def test_unknown_tokens_cost_one_range_query(self):
+        token_blacklist.get_filter()
+        refresh = BlacklistRefreshToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertNotIn(refresh['jti'], token_blacklist)
+
+    def test_tokens_blacklisted_by_other_processes_are_seen_before_the_rebuild(self):
+        token_blacklist.get_filter()
+        refresh = BlacklistRefreshToken.for_user(self.user)
+        # Another process with its own cache blacklisted the token.
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        self.assertIn(refresh['jti'], token_blacklist)
+
+        response = self.client.post('/api/users/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_tokens_are_purged_in_batches(self):
+        for _ in range(3):
+            BlacklistRefreshToken.for_user(self.user).blacklist()
+        live = BlacklistRefreshToken.for_user(self.user)
+        OutstandingToken.objects.exclude(jti=live['jti']).update(expires_at=timezone.now() - datetime.timedelta(days=1))
+
+        call_command('purge_expired_tokens', batch_size=2, stdout=open('/dev/null', 'w'))
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(PASSWORD_HASHING={'ROUNDS': 4, 'MAX_WORKERS': 2})
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        Role.objects.create(name='teacher')
+        self.role = Role.objects.create(name='student')
+        self.client = APIClient()
+
+    def login(self):
+        return self.client.post('/api/users/token/', {'email': 'student@natije.kz', 'password': 'secret'})
+
+    def test_registration_hashes_with_configured_cost(self):
+        response = self.client.post('/api/users/register/', {'email': 'student@natije.kz', 'password': 'secret',
+                                                              'first_name': 'Test', 'last_name': 'Student'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('access', response.json())
+        encoded = User.objects.get().password
+        self.assertEqual(identify_hasher(encoded).decode(encoded)['work_factor'], 4)
+
+    def test_login_upgrades_outdated_hashes(self):
+        User.objects.create(email='student@natije.kz', password=make_password('secret', hasher='pbkdf2_sha256'),
+                            first_name='Test', last_name='Student', role=self.role)
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(User.objects.get().password.startswith('bcrypt_sha256$'))
+
+        with override_settings(PASSWORD_HASHING={'ROUNDS': 5, 'MAX_WORKERS': 2}):
+            self.assertEqual(self.login().status_code, 200)
+        encoded = User.objects.get().password
+        self.assertEqual(identify_hasher(encoded).decode(encoded)['work_factor'], 5)
+
+    def test_wrong_credentials_are_rejected(self):
+        User.objects.create_user(email='student@natije.kz', password='other', first_name='Test',
+                                 last_name='Student', role=self.role)
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.client.post('/api/users/token/', {'email': 'nobody@natije.kz',
+                                                                 'password': 'secret'}).status_code, 401)
+
+
+class ProfileViewTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        Role.objects.create(name='teacher')
+        self.user = User.objects.create_user(email='student@natije.kz', password='secret', first_name='Test',
+                                             last_name='Student', role=Role.objects.create(name='student'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_users_are_created_with_a_profile(self):
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_users_saved_outside_the_manager_get_a_profile(self):
+        user = User.objects.create(email='admin-made@natije.kz', first_name='Admin', last_name='Made',
+                                   role=self.user.role)
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 200)
+
+    def test_profile_is_read_in_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.json()['user']['role']['name'], 'student')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/users/profile/').json(), response.json())
+
+    def test_update_invalidates_the_cached_profile(self):
+        etag = self.client.get('/api/users/profile/')['ETag']
+        response = self.client.patch('/api/users/profile/', {'user': {'first_name': 'Renamed'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/users/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['first_name'], 'Renamed')
+
+    def test_delete_deactivates_then_removes_the_account(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete('/api/users/profile/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Profile.objects.filter(user_id=self.user.pk).exists())
+
+    def test_async_view_serves_the_same_profile(self):
+        response = self.client.get('/api/users/async/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.client.get('/api/users/profile/').json())
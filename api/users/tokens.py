@@ -0,0 +1,82 @@
+import datetime
+
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.users.blacklist import token_blacklist
+from api.users.models import Profile, User
+
+
+class BlacklistRefreshToken(RefreshToken):
+    """
+    Refresh token checked against the in-memory blacklist instead of querying
+    BlacklistedToken on every refresh.
+    """
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in token_blacklist:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        token_blacklist.add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return result
+
+
+def add_user_claims(token, user):
+    """
+    Sign what the permissions need to know about the user into the token.
+    """
+    test_limit = Profile.objects.filter(user_id=user.id).values_list('test_limit', flat=True).first()
+    token['role'] = user.role.name
+    token['is_superuser'] = user.is_superuser
+    token['test_limit'] = int(test_limit.timestamp()) if test_limit else None
+    return token
+
+
+def get_tokens_for_user(user):
+    refresh = add_user_claims(BlacklistRefreshToken.for_user(user), user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user built from the claims of a validated access token, so that
+    authenticating a request does not read the users table. It is not a User
+    instance: views that need one load it by id, and writes set `user_id`.
+    """
+
+    @cached_property
+    def role_name(self):
+        return self.token.get('role')
+
+    @cached_property
+    def test_limit(self):
+        timestamp = self.token.get('test_limit')
+        if timestamp is None:
+            return None
+        return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = BlacklistRefreshToken
+
+    def validate(self, attrs):
+        # The refresh token outlives a deleted or deactivated account.
+        user_id = self.token_class(attrs['refresh'])[api_settings.USER_ID_CLAIM]
+        user = User.objects.select_related('role').filter(pk=user_id).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(_('No active account found for the given credentials'), 'no_active_account')
+
+        data = super().validate(attrs)
+        # Claims copied from the refresh token may be days old, sign the current ones.
+        data['access'] = str(add_user_claims(AccessToken(data['access']), user))
+        return data
@@ -1,12 +1,13 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
-from .views import UserRegistrationView, LogoutView, GetUpdateDeleteProfileView
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+from .views import UserRegistrationView, LoginView, LogoutView, GetUpdateDeleteProfileView, AsyncProfileView
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', GetUpdateDeleteProfileView.as_view(), name='profile-rud'),
+    path('async/profile/', AsyncProfileView.as_view(), name='profile-async'),
 ]
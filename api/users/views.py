@@ -1,42 +1,69 @@
-import asyncio
+from adrf.views import APIView as AsyncAPIView
 from asgiref.sync import sync_to_async
 
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework import status, generics
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from api.cache import acached_response, cached_response
+from .cache import profile_cache, profile_namespace
+from .hashing import aauthenticate
 from .models import User, Profile
-from .serializers import UserSerializer, ProfileSerializer, ProfileUpdateSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tasks import delete_user_account
+from .serializers import LoginSerializer, UserSerializer, ProfileSerializer, ProfileUpdateSerializer
+from .tokens import BlacklistRefreshToken, get_tokens_for_user
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 
 
-class UserRegistrationView(generics.CreateAPIView):
+class UserRegistrationView(AsyncAPIView):
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+    authentication_classes = ()
     permission_classes = (AllowAny,)
 
-    def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = await User.objects.acreate_user(**serializer.validated_data)
+        tokens = await sync_to_async(get_tokens_for_user)(user)
+        return Response(tokens, status=status.HTTP_201_CREATED)
+
+
+class LoginView(AsyncAPIView):
+    serializer_class = LoginSerializer
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    www_authenticate_realm = 'api'
 
-        refresh = RefreshToken.for_user(user)
-        access_token = refresh.access_token
+    def get_authenticate_header(self, request):
+        return f'{api_settings.AUTH_HEADER_TYPES[0]} realm="{self.www_authenticate_realm}"'
 
-        data = {
-            'refresh': str(refresh),
-            'access': str(access_token),
-        }
-        return Response(data, status=status.HTTP_201_CREATED)
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = await aauthenticate(serializer.validated_data['email'], serializer.validated_data['password'])
+        if user is None:
+            raise AuthenticationFailed('No active account found with the given credentials', 'no_active_account')
+        tokens = await sync_to_async(get_tokens_for_user)(user)
+        return Response(tokens, status=status.HTTP_200_OK)
 
 
 class LogoutView(APIView):
     permission_classes = (IsAuthenticated,)
 
-    def get(self, request):
+    def post(self, request):
         refresh_token = self.request.data.get('refresh_token')
-        token = RefreshToken(token=refresh_token)
+        if not refresh_token:
+            return Response({"refresh_token": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            token = BlacklistRefreshToken(token=refresh_token)
+        except TokenError as e:
+            return Response({"refresh_token": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
         token.blacklist()
         return Response({"status": "Сау болыңыз!!"}, status=status.HTTP_200_OK)
 
@@ -44,23 +71,44 @@ class LogoutView(APIView):
 class GetUpdateDeleteProfileView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class_map = {"GET": ProfileSerializer, "PATCH": ProfileUpdateSerializer, "DELETE": UserSerializer}
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.select_related('user__role')
 
     def get_serializer_class(self):
         return self.serializer_class_map.get(self.request.method.upper())
 
     def get_object(self):
-        profile, created = Profile.objects.get_or_create(user=self.request.user)
-        return profile
+        # Profiles are created with their user however it is saved, see api.users.signals.
+        return get_object_or_404(self.get_queryset(), user_id=self.request.user.id)
+
+    def retrieve(self, request, *args, **kwargs):
+        def build_data():
+            return self.get_serializer(self.get_object()).data
+
+        return cached_response(request, profile_cache, profile_namespace(request.user.id), 'profile', build_data)
 
     def update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
-        profile = self.get_object()
-        user = profile.user
-        profile.delete()
-        user.delete()
+        user = self.get_object().user
+        # Deactivated right away so it can no longer log in, the cascading deletes run on a worker.
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        transaction.on_commit(lambda: delete_user_account.delay(user.id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncProfileView(AsyncAPIView):
+    permission_classes = (IsAuthenticated,)
+
+    async def get(self, request, *args, **kwargs):
+        async def build_data():
+            try:
+                profile = await Profile.objects.select_related('user__role').aget(user_id=request.user.id)
+            except Profile.DoesNotExist:
+                raise Http404
+            return ProfileSerializer(profile, context={'request': request}).data
 
-        return self.destroy(request, *args, **kwargs)
+        return await acached_response(request, profile_cache, profile_namespace(request.user.id), 'profile',
+                                      build_data)
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'natije.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready: the webhook route mounts the bot dispatcher
+# in front of Django.
+from api.tg_shop_bot.webhook import TelegramWebhook  # noqa: E402
+
+application = TelegramWebhook(django_application)
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'natije.settings')
+
+app = Celery('natije')
+
+# Every CELERY_* Django setting configures the app, e.g. CELERY_BROKER_URL -> broker_url.
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -90,9 +90,111 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Public GET responses (course catalog, syllabus) are cached in an in-process LRU
+# tier in front of the shared cache alias below.
+RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'LOCAL_MAXSIZE': 512,
+    'TIMEOUT': 60 * 60,
+}
+
+# Lesson durations are fetched from YouTube by a Celery task after a lesson is saved.
+# MAX_WORKERS bounds the parallel fetches of the resolve_lesson_durations command.
+LESSON_DURATIONS = {
+    'RESOLVER': 'api.courses.durations.PytubeDurationResolver',
+    'CACHE_ALIAS': 'default',
+    'CACHE_TTL': 60 * 60 * 24,
+    'MAX_WORKERS': 4,
+}
+
+# Answers toggled during a quiz attempt are buffered in this cache and written to
+# the database on autosave and submit. The cache must be shared by all workers (e.g. Redis)
+# for buffering: with a process-local one, such as the LocMem default, every toggle is written
+# to the database right away.
+QUIZ_SESSIONS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60 * 6,
+    'AUTOSAVE_INTERVAL': 30,
+}
+
+# Purchased courses and the quiz access limit of each user, read by the course and quiz permissions.
+# Changes invalidate the cached entry, which other workers only see through a shared cache (e.g. Redis).
+# With a process-local one, such as the LocMem default, entries are kept LOCAL_TIMEOUT seconds instead,
+# the longest a purchase can go unnoticed by another worker.
+ENTITLEMENTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'LOCAL_TIMEOUT': 10,
+}
+
+# Single-use course and quiz access codes (api.courses.access_codes): LENGTH random characters,
+# stored as HMACs and inserted BATCH_SIZE rows per query.
+ACCESS_CODES = {
+    'LENGTH': 12,
+    'BATCH_SIZE': 1000,
+    'MAX_ISSUE_COUNT': 100_000,
+}
+
+# Blacklisted refresh tokens are checked against the cache and a per-process bloom filter, which picks
+# up tokens blacklisted by other processes with one primary key range query. Only filter hits are
+# confirmed in the database.
+TOKEN_BLACKLIST = {
+    'CACHE_ALIAS': 'default',
+    'FILTER_CAPACITY': 100_000,
+    'FILTER_ERROR_RATE': 0.01,
+    'REBUILD_INTERVAL': 60 * 5,
+}
+
+# Updates are handled as concurrent tasks, at most MAX_CONCURRENT_UPDATES at a time. In webhook mode
+# (see api.tg_shop_bot.webhook) Telegram posts updates to WEBHOOK_PATH of the ASGI app with WEBHOOK_SECRET,
+# which must be set for updates to be accepted. Update ids seen in the last DEDUP_TTL seconds are skipped,
+# CACHE_ALIAS must then be a cache shared by the workers. Polling (manage.py bot) is meant for development.
+# FSM states are shared by the bot processes through FSM_STORAGE (DatabaseStorage, or CacheStorage on
+# CACHE_ALIAS when that cache is shared) and expire FSM_TTL seconds after their last change.
+TELEGRAM_BOT = {
+    'MAX_CONCURRENT_UPDATES': 100,
+    'WEBHOOK_PATH': '/telegram/webhook/',
+    'WEBHOOK_SECRET': os.environ.get('TELEGRAM_WEBHOOK_SECRET', ''),
+    'CACHE_ALIAS': 'default',
+    'DEDUP_TTL': 60 * 60 * 24,
+    'FSM_STORAGE': 'api.tg_shop_bot.storage.DatabaseStorage',
+    'FSM_TTL': 60 * 60 * 24,
+    'FSM_EVICT_INTERVAL': 60 * 10,
+}
+
+# Background tasks (api.*.tasks). Deployments must set CELERY_BROKER_URL and run a worker per queue, e.g.
+# celery -A natije worker -Q scoring,accounts and celery -A natije worker -Q durations.
+# Without it, which is meant for tests and local development only, tasks run eagerly inside the request
+# that queued them, retries included: a lesson whose video YouTube keeps failing holds its request
+# for every attempt, back to back.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'memory://')
+CELERY_TASK_ALWAYS_EAGER = 'CELERY_BROKER_URL' not in os.environ
+# Eager errors stay in the task result (result.get() raises them), so eager tasks retry like queued ones.
+CELERY_TASK_EAGER_PROPAGATES = False
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+# Acknowledge tasks once done so a lost worker's tasks are redelivered. Tasks must be safe to run twice:
+# scoring stores one result per attempt key, the others only overwrite or delete.
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ROUTES = {
+    'api.courses.tasks.*': {'queue': 'durations'},
+    'api.users.tasks.*': {'queue': 'accounts'},
+    'api.quizzes.tasks.*': {'queue': 'scoring'},
+}
+
 REST_FRAMEWORK = {
+    # Requests are authenticated from the signed token claims (see api.users.tokens.ClaimsUser),
+    # views that need the User instance load it by request.user.id.
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
     )
 }
 
@@ -119,7 +221,8 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'api.users.tokens.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'api.users.tokens.ClaimsTokenRefreshSerializer',
 
     'JTI_CLAIM': 'jti',
 
@@ -128,6 +231,21 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# bcrypt cost factor, set PASSWORD_HASH_ROUNDS per environment (every +1 doubles the cost of a login).
+# Password hashing in async views runs on a pool of MAX_WORKERS threads, bcrypt releases the GIL.
+PASSWORD_HASHING = {
+    'ROUNDS': int(os.environ.get('PASSWORD_HASH_ROUNDS', 12)),
+    'MAX_WORKERS': os.cpu_count() or 1,
+}
+
+PASSWORD_HASHERS = [
+    'api.users.hashers.ConfigurableBCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 